@@ -1,2 +1,11 @@
 from ARNIpy.simulate import simulate
 from ARNIpy.reconstruct import reconstruct
+from ARNIpy.reconstruct_network import reconstruct_network
+from ARNIpy.dataset import Dataset
+from ARNIpy.expansion_cache import ExpansionCache
+from ARNIpy.profiling import Profile
+from ARNIpy.sweep import sweep, tabulate
+from ARNIpy.bootstrap import bootstrap
+from ARNIpy.metrics import roc_curve, auc, roc_auc
+from ARNIpy.evaluation import evaluate, ground_truth
+from ARNIpy.incremental import IncrementalReconstruction
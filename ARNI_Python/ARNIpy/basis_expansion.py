@@ -1,7 +1,97 @@
 #!/usr/bin/env python
 import numpy as np
 
-def basis_expansion(X, K, TYPE, NODE):
+def basis_size(K, TYPE, RANK=None):
+    '''
+     basis_size(K,TYPE,RANK) returns the number of basis functions employed
+     by basis_expansion for an expansion of order K and type TYPE, i.e. the
+     length of the first dimension of the expansion.
+    '''
+    if TYPE in ('fourier', 'fourier_diff'):
+        return(2*(K+1))
+    elif TYPE == 'power_series':
+        return((K+1)*(K+1))
+    elif TYPE == 'RBF':
+        return(K if RANK is None else min(RANK, K))
+    else:
+        return(K+1)
+
+def rbf_centers(X, K, NODE, CENTERS='first'):
+    '''
+     rbf_centers(X,K,NODE,CENTERS) selects the K centers of the radial basis
+     functions of every possible incoming connection j, on the plane
+     (x_{j}, x_{NODE}).
+
+     Parameters
+     ------------------
+     X:       Matrix containing N time series of M time points.
+     K:       Number of centers.
+     NODE:    Unit on which we are performing the reconstruction.
+     CENTERS: Selection of the centers: first (the first K time points),
+              random (K time points drawn at random), kmeans++ (k-means++
+              seeding on the time points of every plane) or grid (a regular
+              grid spanning the range of every plane).
+
+     Input type
+     ------------------
+     X:       double
+     K:       integer
+     NODE:    integer
+     CENTERS: string
+
+     Output
+     ------------------
+     C: Array of size [K,N,2] whose entry [k,j] holds the coordinates
+        (x_{j}, x_{NODE}) of the k-th center of connection j.
+    '''
+    N, M = X.shape
+    C = np.empty((K, N, 2))
+
+    if CENTERS in ('first', 'random'):
+        if K > M:
+            raise ValueError('RBF with %s centers needs K<=M' % CENTERS)
+        if CENTERS == 'first':
+            t = np.arange(K)
+        else:
+            t = np.random.choice(M, K, replace=False)
+        C[:,:,0] = X[:,t].T
+        C[:,:,1] = X[NODE,t][:,None]
+
+    elif CENTERS == 'kmeans++':
+        # Seeding of all planes at once: every center is drawn with
+        # probability proportional to the squared distance of the time
+        # points to the nearest center drawn so far
+        Xt = np.ascontiguousarray(X.T)
+        xnode = Xt[:,NODE][:,None]
+        D = np.empty((M, N))
+        D.fill(np.inf)
+        t = np.random.randint(M, size=N)
+        for k in xrange(K):
+            C[k,:,0] = Xt[t, np.arange(N)]
+            C[k,:,1] = xnode[t,0]
+            D = np.minimum(D, (Xt - C[k,:,0])**2 + (xnode - C[k,:,1])**2)
+            if k < K-1:
+                cum = np.cumsum(D, axis=0)
+                u = np.random.uniform(0., 1., size=N) * cum[-1]
+                t = np.minimum(np.sum(cum < u, axis=0), M-1)
+
+    elif CENTERS == 'grid':
+        g1 = int(np.ceil(np.sqrt(K)))
+        g2 = int(np.ceil(K/float(g1)))
+        a = np.linspace(0., 1., g1)
+        b = np.linspace(0., 1., g2) if g2 > 1 else np.array([0.5])
+        A, B = [G.ravel()[:K] for G in np.meshgrid(a, b, indexing='ij')]
+        lo, hi = X.min(axis=1), X.max(axis=1)
+        C[:,:,0] = lo + A[:,None]*(hi - lo)
+        C[:,:,1] = lo[NODE] + B[:,None]*(hi[NODE] - lo[NODE])
+
+    else:
+        raise ValueError('CENTERS must be first, random, kmeans++ or grid')
+
+    return(C)
+
+def basis_expansion(X, K, TYPE, NODE, out=None, CENTERS=None, RANK=None,
+                    DTYPE=None):
     '''
      basis_expansion(X,K,TYPE,NODE) generates a multidimensional array of
      basis expansions evaluated on all points of a multivariate time series.
@@ -19,6 +109,16 @@ def basis_expansion(X, K, TYPE, NODE):
            based on radial basis functions). These functions are shown in
            table I in the main manuscript.
      NODE: Unit on which we are performing the reconstruction. Zero indexed.
+     out:  Optional array of size [basis_size(K,TYPE,RANK),M,N] in which the
+           expansion is written.
+     CENTERS: For RBF, selection of the centers (see rbf_centers) or an
+           array of centers as returned by rbf_centers. The first K time
+           points are used if None.
+     RANK: For RBF, number of Nystroem features approximating the K radial
+           basis functions; all K are used if None.
+     DTYPE: Floating point type of the expansion, e.g. float32 to halve its
+           memory. The type of out is used if given, and that of X (float64
+           for non-floating X) if None.
 
      Input type
      ------------------
@@ -26,18 +126,29 @@ def basis_expansion(X, K, TYPE, NODE):
      K:    integer
      TYPE: string
      NODE: integer
+     out:  double
+     CENTERS: string, double or None
+     RANK: integer or None
+     DTYPE: numpy dtype or None
 
      Output
      ------------------
      Expansion: Multidimensional array of size [K+1,M,N] containing the
      evalation of all k=0,1,...,K basis functions for all M time points and
-     all N possible incoming connections. For power_series, (K*K+2) basis
-     functions are employed, and for fourier(_diff), 2*(K+1) are employed.
+     all N possible incoming connections. For power_series, (K+1)*(K+1) basis
+     functions are employed, for fourier(_diff), 2*(K+1) are employed, and
+     for RBF, K are employed (RANK if given).
+
+     RBF are multiquadrics sqrt(r^2+2) of the distance r between (x_{j},
+     x_{NODE}) and every center of connection j. With RANK, the expansion is
+     projected onto the RANK leading eigenvectors of the kernel matrix of
+     the centers (Nystroem approximation), which shrinks the blocks of the
+     greedy search when many centers are requested.
 
      Example
      ------------------
      basis_expansion(X,4,'power_series',5); generates a multidimensional array
-     of size [18,M,N] containing the evaluation of the basis for all M time
+     of size [25,M,N] containing the evaluation of the basis for all M time
      points and all N possible incoming connections.
 
      Accompanying material to "Model-free inference of direct interactions
@@ -48,59 +159,98 @@ def basis_expansion(X, K, TYPE, NODE):
     '''
 
     N,M = X.shape
-    Expansion = np.zeros((K+1, M, N))
-
-    if TYPE == 'polynomial':
-        for n in xrange(N):
-            for k in xrange(K):
-                Expansion[k,:,n] = X[n,:]**k
-
-    elif TYPE == 'polynomial_diff':
-        Xi =np.zeros((N,M))
-        for m in xrange(M):
-            Xi[:,m] = X[:,m]-X[NODE,m]
-
-        for n in xrange(N):
-            for k in xrange(K):
-                Expansion[k,:,n] = Xi[n,:]**k
-
-    elif TYPE == 'fourier':
-        Expansion=np.zeros((2*(K), M,N))
-        for n in xrange(N):
-            t = 0
-            for k in xrange(K):
-                Expansion[k+t,:,n] = np.sin(k*X[n,:])
-                Expansion[k+t+1,:,n] = np.cos(k*X[n,:])
-                t += 1
-
-    elif TYPE == 'fourier_diff':
-        Expansion=np.zeros((2*(K),M,N))
-        Xi = np.zeros((N,M))
-        for m in xrange(M):
-            Xi[:,m] = X[:,m] - X[NODE, m]
-
-        for n in xrange(N):
-            t = 0
-            for k in xrange(K):
-                Expansion[k+t,:,n] = np.sin(k*Xi[n,:])
-                Expansion[k+t+1,:,n] = np.cos(k*Xi[n,:])
-                t += 1
+    shape = (basis_size(K, TYPE, RANK), M, N)
+    if out is None:
+        if DTYPE is None:
+            DTYPE = X.dtype if np.issubdtype(X.dtype, np.floating) else float
+        dtype = np.dtype(DTYPE)
+        Expansion = np.empty(shape, dtype)
+    elif out.shape != shape:
+        raise ValueError('out must have shape %s' % (shape,))
+    else:
+        dtype = out.dtype
+        Expansion = out
+
+    # Time points along the second and units along the third dimension
+    if TYPE in ('polynomial_diff', 'fourier_diff'):
+        Xt = np.ascontiguousarray((X - X[NODE,:]).T, dtype)
+    else:
+        Xt = np.ascontiguousarray(np.transpose(X), dtype)
+
+    if TYPE in ('polynomial', 'polynomial_diff'):
+        # Powers by cumulative products
+        Expansion[0] = 1.
+        for k in xrange(1, K+1):
+            np.multiply(Expansion[k-1], Xt, out=Expansion[k])
+
+    elif TYPE in ('fourier', 'fourier_diff'):
+        # Harmonics by angle-addition recurrences
+        S1 = np.sin(Xt)
+        C1 = np.cos(Xt)
+        tmp = np.empty((M, N), dtype)
+        Expansion[0] = 0.
+        Expansion[1] = 1.
+        for k in xrange(1, K+1):
+            Sk, Ck = Expansion[2*k-2], Expansion[2*k-1]
+            np.multiply(Sk, C1, out=Expansion[2*k])
+            Expansion[2*k] += np.multiply(Ck, S1, out=tmp)
+            np.multiply(Ck, C1, out=Expansion[2*k+1])
+            Expansion[2*k+1] -= np.multiply(Sk, S1, out=tmp)
 
     elif TYPE == 'power_series':
-        Expansion = np.zeros(((K)*(K), M, N))
-        for n in xrange(N):
-            for k1 in xrange(K):
-                for k2 in xrange(K):
-                    for m in xrange(M):
-                        Expansion[((K)*k1)+k2, m, n] = (X[NODE,m]**k1)*(X[n,m]**k2)
+        # Outer products of the powers of x_{NODE} and x_{j}
+        P = np.empty((K+1, M, N), dtype)
+        P[0] = 1.
+        for k in xrange(1, K+1):
+            np.multiply(P[k-1], Xt, out=P[k])
+        Pnode = P[:,:,NODE].copy()
+        for k1 in xrange(K+1):
+            np.multiply(Pnode[k1][:,None], P, out=Expansion[(K+1)*k1:(K+1)*(k1+1)])
 
     elif TYPE == 'RBF':
-        Expansion = np.zeros((K,M,N))
-        for n in xrange(N):
-            A = np.vstack((X[n,:], X[NODE,:]))
-            for m1 in xrange(K):
-                for m2 in xrange(M):
-                    Expansion[m1,m2, n] = np.sqrt(2.0+np.linalg.norm(A[:,m1]-A[:,m2],2)**2)
+        if CENTERS is None or isinstance(CENTERS, basestring):
+            C = rbf_centers(X, K, NODE, CENTERS or 'first')
+        else:
+            C = CENTERS
+        C = np.asarray(C, dtype)
+        if RANK is None:
+            Phi = Expansion
+        else:
+            Phi = np.empty((K, M, N), dtype)
+        # Multiquadrics centered at C[k,j] on the plane (x_{j}, x_{NODE}),
+        # one center at a time
+        xnode = Xt[:,NODE][:,None]
+        if np.all(C[:,:,1] == C[:,:1,1]):
+            # x_{NODE} coordinates shared by all connections
+            Cnode = C[:,:1,1]
+        else:
+            Cnode = C[:,:,1]
+        tmp = np.empty((M, Cnode.shape[1]), dtype)
+        for k in xrange(K):
+            np.subtract(Xt, C[k,:,0], out=Phi[k])
+            Phi[k] *= Phi[k]
+            np.subtract(xnode, Cnode[k], out=tmp)
+            tmp *= tmp
+            tmp += 2.0
+            Phi[k] += tmp
+        np.sqrt(Phi, out=Phi)
+
+        if RANK is not None:
+            # Nystroem features: projection onto the leading eigenvectors of
+            # the (indefinite) kernel matrix of the centers of every
+            # connection, scaled by the inverse square root of the magnitude
+            # of the eigenvalues
+            D = np.asarray(C[:,None,:,:] - C[None,:,:,:], float)
+            Kc = np.sqrt(np.sum(D*D, axis=3) + 2.0).transpose(2, 0, 1)
+            lam, V = np.linalg.eigh(Kc)
+            idx = np.argsort(-np.abs(lam), axis=1)[:,:shape[0]]
+            rows = np.arange(N)[:,None]
+            lam = np.abs(lam[rows, idx])
+            V = V[rows[:,:,None], np.arange(K)[None,:,None], idx[:,None,:]]
+            V /= np.sqrt(np.maximum(lam, np.finfo(float).tiny))[:,None,:]
+            V = V.astype(dtype)
+            for j in xrange(N):
+                Expansion[:,:,j] = np.dot(V[j].T, Phi[:,:,j])
 
     return(Expansion)
 
@@ -197,4 +347,60 @@ if __name__ == "__main__":
 
             np.testing.assert_almost_equal(E, T)
 
+        def test_RBF(self):
+            X = np.reshape(np.arange(0,6,1), (2,3))
+            K = 2
+            NODE = 0
+            E = basis_expansion(X,K,'RBF',NODE)
+
+            T1 = np.sqrt(2. + 2.*np.array([[0., 1., 4.],
+                                           [1., 0., 1.]]))
+            T = np.zeros((2,3,2))
+            T[:,:,0] = T1
+            T[:,:,1] = T1
+
+            np.testing.assert_almost_equal(E, T)
+
+        def test_out(self):
+            X = np.random.uniform(-3.,3.,size=(4,20))
+            for TYPE in ('polynomial', 'fourier_diff', 'power_series', 'RBF'):
+                out = np.zeros((basis_size(3,TYPE),20,4))
+                E = basis_expansion(X,3,TYPE,1,out=out)
+                self.assertTrue(E is out)
+                np.testing.assert_almost_equal(E, basis_expansion(X,3,TYPE,1))
+
+        def test_RBF_centers(self):
+            X = np.random.uniform(-3.,3.,size=(4,50))
+            for CENTERS in ('first', 'random', 'kmeans++', 'grid'):
+                C = rbf_centers(X,6,1,CENTERS)
+                self.assertEqual(C.shape, (6,4,2))
+                E = basis_expansion(X,6,'RBF',1,CENTERS=C)
+                # the multiquadrics equal sqrt(2) at their centers
+                if CENTERS != 'grid':
+                    self.assertTrue(np.all(np.isclose(E, np.sqrt(2.)).sum(axis=1) >= 1))
+            np.testing.assert_almost_equal(basis_expansion(X,6,'RBF',1,CENTERS='first'),
+                                           basis_expansion(X,6,'RBF',1))
+
+        def test_RBF_rank(self):
+            X = np.random.uniform(-3.,3.,size=(4,50))
+            E = basis_expansion(X,6,'RBF',1)
+            F = basis_expansion(X,6,'RBF',1,RANK=6)
+            G = basis_expansion(X,6,'RBF',1,RANK=3)
+            self.assertEqual(G.shape, (3,50,4))
+            # with full rank, the features span the same space as the RBF
+            for j in xrange(4):
+                P = np.linalg.lstsq(F[:,:,j].T, E[:,:,j].T, rcond=None)[0]
+                np.testing.assert_almost_equal(np.dot(F[:,:,j].T, P), E[:,:,j].T)
+
+        def test_dtype(self):
+            X = np.random.uniform(-3.,3.,size=(4,50))
+            for TYPE in ('polynomial','polynomial_diff','fourier','fourier_diff','power_series','RBF'):
+                E = basis_expansion(X,3,TYPE,1)
+                F = basis_expansion(X,3,TYPE,1,DTYPE=np.float32)
+                G = basis_expansion(X.astype(np.float32),3,TYPE,1)
+                self.assertEqual(E.dtype, np.float64)
+                self.assertEqual(F.dtype, np.float32)
+                self.assertEqual(G.dtype, np.float32)
+                np.testing.assert_allclose(F, E, rtol=1e-4, atol=1e-4)
+
     unittest.main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+import multiprocessing
+import numpy as np
+import os
+import sys
+import tempfile
+
+from basis_expansion import basis_size
+from dataset import Dataset, dimension
+from gram_statistics import GramStatistics, iter_statistics
+from greedy_search import greedy_search_gram
+from reconstruct_network import _share, _view
+
+# Statistics of every time series shared with the worker processes
+_series = {}
+
+STATISTICS = ('G', 'b', 'd', 'sY', 'sDX', 'L')
+
+def _gram_store(S, NK, DIR):
+    # Block for the Gram matrices of the S time series: shared memory, or a
+    # temporary file in DIR to be memory-mapped
+    if DIR is None:
+        return((multiprocessing.RawArray('d', S*NK*NK), (S, NK, NK), np.dtype(float)))
+    fd, path = tempfile.mkstemp('.gram', dir=DIR)
+    os.close(fd)
+    return((path, (S, NK, NK), np.dtype(float)))
+
+def _gram_view(store, mode='r'):
+    # Array on a block returned by _gram_store
+    if isinstance(store[0], basestring):
+        path, shape, dtype = store
+        return(np.memmap(path, dtype, mode, shape=shape))
+    return(_view(store))
+
+def _init_worker(K, N, M, th, SCREEN, arrays, store):
+    _series.update(K=K, N=N, M=M, th=th, SCREEN=SCREEN)
+    for name in STATISTICS[1:]:
+        _series[name] = _view(arrays[name])
+    _series['G'] = _gram_view(store)
+
+def _replicates(weights):
+    # Greedy searches on the statistics of a batch of replicates, the time
+    # series of replicate b being drawn weights[b,s] times each: only the
+    # weighted sums of the batch are formed at a time
+    sums = dict((name, np.tensordot(weights, _series[name], 1)) for name in STATISTICS)
+    results = []
+    for b in xrange(len(weights)):
+        stats = GramStatistics(_series['K'], _series['N'])
+        for name in STATISTICS:
+            setattr(stats, name, sums[name][b])
+        results.append(greedy_search_gram(stats, _series['M'], _series['th'],
+                                          _series['SCREEN']))
+    return(results)
+
+def bootstrap(MODEL, NODE, BASIS, ORDER, B=100, DATA=None, PROCESSES=None,
+              SEED=None, SCREEN=None, CENTERS=None, RANK=None, DTYPE=None,
+              BATCH=10, DIR=None):
+    '''
+     bootstrap(MODEL,NODE,BASIS,ORDER,B,DATA,PROCESSES,SEED,SCREEN,CENTERS,
+     RANK,DTYPE,BATCH,DIR) measures the stability of the incoming connections
+     of unit NODE inferred by reconstruct, by repeating the reconstruction on
+     B bootstrap replicates of the data set: S time series drawn with
+     replacement from its S time series.
+
+     The Gram statistics of the basis expansion (see gram_statistics) are
+     computed once for every time series. Those of a replicate are their sum
+     weighted by the number of times every time series is drawn, so that a
+     replicate only costs a greedy search on matrices whose size does not
+     depend on the length of the recordings. Replicates are distributed in
+     batches of BATCH over a pool of worker processes sharing the statistics.
+
+     The Gram matrices of the time series take S*(N*K)**2*8 bytes, K being
+     the size of the block of every connection (see GramStatistics): they
+     are kept in shared memory, or memory-mapped from a temporary file in
+     DIR for data sets whose matrices do not fit in memory. Every worker
+     forms the sums of one batch at a time, i.e. BATCH matrices of size
+     [N*K,N*K].
+
+     Parameters
+     ------------------
+     MODEL:     Dynamic model employed. See reconstruct.
+     NODE:      Unit upon the reconstruction takes place. Zero indexed.
+     BASIS:     Type of basis employed. See reconstruct.
+     ORDER:     Number of basis in the expansion.
+     B:         Number of bootstrap replicates.
+     DATA:      Dataset to reconstruct from. The data set in 'Data/' is read
+                if None.
+     PROCESSES: Number of worker processes. The number of CPUs is used if
+                None, and the replicates run in the calling process if 1.
+     SEED:      Seed of the random generator drawing the replicates.
+     SCREEN:    Number of candidates searched. See reconstruct.
+     CENTERS:   For RBF, selection of the centers. See reconstruct. The
+                centers are selected on the leading time series that supply
+                ORDER time points and shared by all replicates.
+     RANK:      For RBF, number of Nystroem features. See reconstruct.
+     DTYPE:     Floating point type of the time derivatives and expansions.
+                See reconstruct.
+     BATCH:     Number of replicates whose statistics are summed at once by
+                a worker.
+     DIR:       Directory of the temporary file holding the Gram matrices of
+                the time series. They are kept in memory if None.
+
+     Input type
+     ------------------
+     MODEL:     string
+     NODE:      integer
+     BASIS:     string
+     ORDER:     integer
+     B:         integer
+     DATA:      Dataset or None
+     PROCESSES: integer or None
+     SEED:      integer or None
+     SCREEN:    integer or None
+     CENTERS:   string or None
+     RANK:      integer or None
+     DTYPE:     numpy dtype or None
+     BATCH:     integer
+     DIR:       string or None
+
+     Output
+     ------------------
+     frequency: Fraction of the replicates in which every possible incoming
+                connection is inferred.
+     scores:    Matrix of size [B,N] whose row b contains the scores of the
+                inferred incoming connections in replicate b (zero for
+                non-inferred ones), as used in ROC curves by reconstruct.
+     llists:    Sequence of inferred interactions of every replicate.
+
+     Example
+     ------------------
+     frequency, scores, _ = bootstrap('kuramoto2',10,'fourier_diff',6,200)
+     yields, for every unit, how often it is inferred as an incoming
+     connection of unit 10 and the distribution of its score.
+
+     Accompanying material to "Model-free inference of direct interactions
+     from nonlinear collective dynamics".
+    '''
+
+    #Stopping criterium: decrease it to recover longer list of possible links
+    th=0.0001
+
+    models=['kuramoto1', 'kuramoto2', 'michaelis_menten', 'roessler']
+    bases=['polynomial', 'polynomial_diff', 'fourier', 'fourier_diff', 'power_series', 'RBF']
+
+    if (MODEL not in models):
+        sys.exit('ERROR: MODEL must be a valid string: kuramoto1')
+
+    elif (BASIS not in bases):
+        sys.exit('ERROR: BASIS must be a valid string: polynomial')
+
+    if DATA is None:
+        print('Reading data...')
+        DATA = Dataset.load()
+
+    print('Accumulating the statistics of every time series...')
+    D = dimension(MODEL)
+    K, N, S = D*basis_size(ORDER, BASIS, RANK), DATA.N // D, DATA.S
+    arrays = {'b': _share(np.zeros((S, N*K))), 'd': _share(np.zeros(S)),
+              'sY': _share(np.zeros((S, N*K))), 'sDX': _share(np.zeros(S)),
+              'L': _share(np.zeros(S, dtype=int))}
+    store = _gram_store(S, N*K, DIR)
+    try:
+        G = _gram_view(store, 'w+')
+        for s, part in enumerate(iter_statistics(DATA, MODEL, NODE, BASIS, ORDER, 1,
+                                                 None, CENTERS, RANK, DTYPE)):
+            G[s] = part.G
+            for name in STATISTICS[1:]:
+                _view(arrays[name])[s] = getattr(part, name)
+        if DIR is not None:
+            G.flush()
+        del G
+
+        # Number of times every time series is drawn in every replicate
+        random = np.random.RandomState(SEED)
+        weights = np.array([random.multinomial(S, np.ones(S)/S) for b in xrange(B)])
+        batches = [weights[i:i+BATCH] for i in xrange(0, B, BATCH)]
+
+        print('Performing ARNI on %i bootstrap replicates...' % B)
+        settings = (K, N, DATA.M, th, SCREEN, arrays, store)
+        if PROCESSES == 1:
+            _init_worker(*settings)
+            results = map(_replicates, batches)
+        else:
+            pool = multiprocessing.Pool(PROCESSES, _init_worker, settings)
+            try:
+                results = pool.map(_replicates, batches, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+    finally:
+        _series.clear()
+        if DIR is not None:
+            os.remove(store[0])
+    results = [result for batch in results for result in batch]
+
+    scores = np.zeros((B, N))
+    frequency = np.zeros(N)
+    llists = []
+    for b, (llist, cost, vec) in enumerate(results):
+        scores[b,:] = vec
+        frequency[llist] += 1./B
+        llists.append(llist)
+    print('Bootstrap has finished!')
+
+    return(frequency, scores, llists)
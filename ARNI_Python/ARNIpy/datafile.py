@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+import json
+import numpy as np
+import os
+from scipy import sparse
+import sys
+
+# Version of the binary dataset layout written by save_data
+VERSION = 1
+
+# Files of a dataset, in binary and in text form
+FILES = ('data.npy', 'dataset.json', 'data.dat', 'ts_param.dat',
+         'connectivity.npy', 'connectivity.npz', 'connectivity.dat',
+         'frequencies.npy', 'frequencies.dat')
+
+def save_data(Y, S, M, MODEL=None, DIR='Data', FORMAT='npy'):
+    '''
+     save_data(Y,S,M,MODEL,DIR,FORMAT) writes simulated time series in binary
+     form.
+
+     The time series are stored in 'DIR/data.npy' as an array of size
+     [S*M,N], i.e. in the same concatenated form as 'data.dat', but in
+     column-major order so that the time series of a single unit are
+     contiguous on disk. A small header 'DIR/dataset.json' holds S, M, N, the
+     dtype and the model employed. If FORMAT is dat, the text files
+     'DIR/data.dat' and 'DIR/ts_param.dat' are written instead.
+
+     Input type
+     ------------------
+     Y:      double, array of size [S*M,N]
+     S:      integer
+     M:      integer
+     MODEL:  string or None
+     DIR:    string
+     FORMAT: string
+    '''
+    if FORMAT == 'dat':
+        ts_param=[S,M]
+        np.savetxt(os.path.join(DIR, 'data.dat'), Y, fmt='%.4f', delimiter='\t')
+        np.savetxt(os.path.join(DIR, 'ts_param.dat'), ts_param, fmt='%i',delimiter='\t')
+        # a binary dataset would be read instead
+        _remove(DIR, 'data.npy', 'dataset.json')
+        return
+
+    Y = np.asfortranarray(Y)
+    np.save(os.path.join(DIR, 'data.npy'), Y)
+
+    header = {'version': VERSION, 'S': int(S), 'M': int(M),
+              'N': int(Y.shape[1]), 'dtype': Y.dtype.str, 'model': MODEL}
+    with open(os.path.join(DIR, 'dataset.json'), 'w') as f:
+        json.dump(header, f, indent=1, sort_keys=True)
+
+def save_connectivity(J, FORMAT='npy', DIR='Data'):
+    '''
+     save_connectivity(J,FORMAT,DIR) writes a weighted adjacency matrix to
+     'DIR/connectivity.npy', or to 'DIR/connectivity.dat' if FORMAT is dat.
+     Sparse matrices are always written to 'DIR/connectivity.npz'. Matrices
+     written before in other formats that load_connectivity would read
+     instead are removed.
+    '''
+    if sparse.issparse(J):
+        sparse.save_npz(os.path.join(DIR, 'connectivity.npz'), J)
+        _remove(DIR, 'connectivity.npy')
+    elif FORMAT == 'dat':
+        np.savetxt(os.path.join(DIR, 'connectivity.dat'), J, fmt='%.4f', delimiter='\t')
+        _remove(DIR, 'connectivity.npy', 'connectivity.npz')
+    else:
+        np.save(os.path.join(DIR, 'connectivity.npy'), J)
+
+def save_frequencies(w, FORMAT='npy', DIR='Data'):
+    '''
+     save_frequencies(w,FORMAT,DIR) writes the intrinsic frequencies of phase
+     oscillators to 'DIR/frequencies.npy', or to 'DIR/frequencies.dat' if
+     FORMAT is dat, removing 'DIR/frequencies.npy' in the latter case.
+    '''
+    if FORMAT == 'dat':
+        np.savetxt(os.path.join(DIR, 'frequencies.dat'), w, fmt='%.4f', delimiter='\t')
+        _remove(DIR, 'frequencies.npy')
+    else:
+        np.save(os.path.join(DIR, 'frequencies.npy'), w)
+
+def _remove(DIR, *names):
+    # Removes the files names of DIR that exist, e.g. those written in
+    # another format, which the loaders would read in preference to the one
+    # just written
+    for name in names:
+        path = os.path.join(DIR, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+def load_header(DIR='Data'):
+    '''
+     load_header(DIR) returns the header of a binary dataset as a
+     dictionary, or None if DIR only contains text files.
+    '''
+    path = os.path.join(DIR, 'dataset.json')
+    if not os.path.exists(path):
+        return(None)
+    with open(path) as f:
+        return(json.load(f))
+
+def load_data(DIR='Data'):
+    '''
+     load_data(DIR) opens the simulated time series, memory-mapping
+     'DIR/data.npy' if a binary dataset exists and reading 'DIR/data.dat' and
+     'DIR/ts_param.dat' otherwise.
+
+     Output
+     ------------------
+     x: Matrix of size [N,M*S] containing all time series in a concatenated
+        form. For binary datasets, it is a read-only memory map, so that the
+        time series of a unit are only read when accessed.
+     S: Number of different time series.
+     M: Number of time points per time series.
+    '''
+    header = load_header(DIR)
+    if header is not None:
+        data = np.load(os.path.join(DIR, 'data.npy'), mmap_mode='r')
+        return(data.transpose(), header['S'], header['M'])
+
+    data = np.loadtxt(os.path.join(DIR, 'data.dat'), delimiter='\t')
+    ts_param=np.loadtxt(os.path.join(DIR, 'ts_param.dat'), delimiter='\t')
+
+    S = int(ts_param[0])
+    M = int(ts_param[1])
+
+    return(data.transpose(), S, M)
+
+def load_connectivity(DIR='Data'):
+    '''
+     load_connectivity(DIR) reads the weighted adjacency matrix written by
+     topology as a dense matrix, from whichever of 'DIR/connectivity.npy',
+     'DIR/connectivity.npz' or 'DIR/connectivity.dat' exists.
+    '''
+    if os.path.exists(os.path.join(DIR, 'connectivity.npy')):
+        return(np.load(os.path.join(DIR, 'connectivity.npy')))
+    if os.path.exists(os.path.join(DIR, 'connectivity.npz')):
+        return(sparse.load_npz(os.path.join(DIR, 'connectivity.npz')).toarray())
+    return(np.loadtxt(os.path.join(DIR, 'connectivity.dat'), delimiter='\t'))
+
+def load_frequencies(DIR='Data'):
+    '''
+     load_frequencies(DIR) reads the intrinsic frequencies of phase
+     oscillators from 'DIR/frequencies.npy' or 'DIR/frequencies.dat', and
+     returns None if neither exists.
+    '''
+    if os.path.exists(os.path.join(DIR, 'frequencies.npy')):
+        return(np.load(os.path.join(DIR, 'frequencies.npy')))
+    if os.path.exists(os.path.join(DIR, 'frequencies.dat')):
+        return(np.loadtxt(os.path.join(DIR, 'frequencies.dat'), delimiter='\t'))
+    return(None)
+
+def convert(DIR='Data', MODEL=None):
+    '''
+     convert(DIR,MODEL) converts the text files 'data.dat', 'ts_param.dat',
+     'connectivity.dat' and 'frequencies.dat' in DIR into a binary dataset
+     in the same directory. The text files are left untouched.
+
+     Time series written by the MATLAB code contain M+1 time points each;
+     this is detected from the number of rows, and M is stored as the
+     actual number of time points per time series.
+
+     Example
+     ------------------
+     convert('../ARNI_Matlab/Data') converts the data set shipped with the
+     MATLAB code.
+    '''
+    data = np.loadtxt(os.path.join(DIR, 'data.dat'), delimiter='\t', ndmin=2)
+    ts_param = np.loadtxt(os.path.join(DIR, 'ts_param.dat'), delimiter='\t')
+    S = int(ts_param[0])
+    M = int(ts_param[1])
+
+    if data.shape[0] == S*(M+1):
+        M = M+1
+    elif data.shape[0] != S*M:
+        sys.exit('ERROR: data.dat does not contain S*M time points')
+
+    save_data(data, S, M, MODEL, DIR)
+    if os.path.exists(os.path.join(DIR, 'connectivity.dat')):
+        J = np.loadtxt(os.path.join(DIR, 'connectivity.dat'), delimiter='\t')
+        save_connectivity(J, 'npy', DIR)
+    if os.path.exists(os.path.join(DIR, 'frequencies.dat')):
+        w = np.loadtxt(os.path.join(DIR, 'frequencies.dat'), delimiter='\t')
+        save_frequencies(w, 'npy', DIR)
+
+if __name__ == '__main__':
+    # python datafile.py DIR [MODEL] converts the text files in DIR
+    convert(*sys.argv[1:3])
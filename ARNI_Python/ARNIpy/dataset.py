@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+from math import pi
+import numpy as np
+import os
+from scipy import sparse
+
+from datafile import load_connectivity, load_data, load_frequencies, \
+    load_header, save_connectivity, save_data, save_frequencies
+from derivatives import estimate_derivatives, iter_derivatives
+from expansion_cache import fingerprint
+
+# Number of state variables of the units of every model, for models whose
+# units are not one-dimensional. The variables of unit n are the rows
+# D*n,...,D*n+D-1 of the time series, the first one being the one
+# reconstructed.
+DIMENSIONS = {'roessler': 3}
+
+def dimension(MODEL):
+    '''
+     dimension(MODEL) returns the number of state variables of every unit of
+     MODEL.
+    '''
+    return(DIMENSIONS.get(MODEL, 1))
+
+class Dataset(object):
+    '''
+     Dataset(x,S,M,MODEL,connectivity,frequencies) holds the time series of a
+     network in memory, together with the quantities derived from them for
+     the reconstruction. The derived quantities are computed on first access
+     and cached.
+
+     Parameters
+     ------------------
+     x:            Matrix of size [N,M*S] containing all time series in a
+                   concatenated form.
+     S:            Number of different time series.
+     M:            Number of time points per time series.
+     MODEL:        Dynamical model employed, if known.
+     connectivity: Weighted adjacency matrix (dense or scipy.sparse) used
+                   to evaluate the reconstruction, if known.
+     frequencies:  Intrinsic frequencies of phase oscillators, if known.
+
+     Input type
+     ------------------
+     x:            double
+     S:            integer
+     M:            integer
+     MODEL:        string or None
+     connectivity: double or None
+     frequencies:  double or None
+
+     Attributes
+     ------------------
+     midpoints:   Midpoints of consecutive time points, of size
+                  [N,(M-1)*S].
+     differences: Differences of consecutive time points, of size
+                  [N,(M-1)*S].
+     phases:      Midpoints transformed to [0,2*pi), as employed for phase
+                  oscillators.
+     N:           Number of state variables, i.e. rows of x.
+     D:           Number of state variables per unit of MODEL.
+     units:       Number of units, N/D.
+
+     Example
+     ------------------
+     Dataset.load('Data') reads the data set written by simulate, and
+     reconstruct('kuramoto2',10,'fourier_diff',6,DATA=simulate(...))
+     reconstructs from a simulated data set without touching the disk.
+    '''
+    def __init__(self, x, S, M, MODEL=None, connectivity=None, frequencies=None):
+        self.x = x
+        self.S = int(S)
+        self.M = int(M)
+        self.MODEL = MODEL
+        self.connectivity = connectivity
+        self.frequencies = frequencies
+        self._cache = {}
+
+    @property
+    def N(self):
+        return(self.x.shape[0])
+
+    @property
+    def D(self):
+        return(dimension(self.MODEL))
+
+    @property
+    def units(self):
+        return(self.N // self.D)
+
+    def _derivatives(self):
+        if 'midpoints' not in self._cache:
+            Xtemp, DX = estimate_derivatives(self.x, self.S, self.M)
+            self._cache['midpoints'] = Xtemp
+            self._cache['differences'] = DX
+        return(self._cache['midpoints'], self._cache['differences'])
+
+    @property
+    def midpoints(self):
+        return(self._derivatives()[0])
+
+    @property
+    def differences(self):
+        return(self._derivatives()[1])
+
+    @property
+    def phases(self):
+        if 'phases' not in self._cache:
+            self._cache['phases'] = np.mod(self.midpoints, 2*pi)
+        return(self._cache['phases'])
+
+    def inputs(self, MODEL=None, DTYPE=None):
+        '''
+         inputs(MODEL,DTYPE) returns the input matrix X and the time
+         derivatives DX employed in the reconstruction: phases for kuramoto1
+         and kuramoto2, and midpoints otherwise. MODEL defaults to the model
+         of the data set. With DTYPE, e.g. float32, both are converted to
+         that floating point type and cached as such only: they are
+         estimated in the type of the time series for a group of time
+         series at a time, unless already cached in that type.
+        '''
+        if MODEL is None:
+            MODEL = self.MODEL
+        phases = MODEL in ('kuramoto1', 'kuramoto2')
+        if DTYPE is None or np.dtype(DTYPE) == np.result_type(self.x.dtype, 0.5):
+            if phases:
+                return(self.phases, self.differences)
+            return(self.midpoints, self.differences)
+        key = (phases, np.dtype(DTYPE).str)
+        if key not in self._cache:
+            self._cache[key] = self._convert(phases, DTYPE)
+        return(self._cache[key])
+
+    def _convert(self, phases, DTYPE):
+        # Input matrix and time derivatives in DTYPE. Unless those in the
+        # type of x are cached already, they are estimated for a group of
+        # time series at a time and converted, so that they are never held
+        # for the whole data set in the type of x
+        if 'midpoints' in self._cache:
+            X = self.phases if phases else self.midpoints
+            return(X.astype(DTYPE), self.differences.astype(DTYPE))
+        L = self.M - 1
+        X = np.empty((self.N, self.S*L), DTYPE)
+        DX = np.empty((self.N, self.S*L), DTYPE)
+        CHUNK = max(1, 2**20 // max(1, self.N*self.M))
+        start = 0
+        for Xtemp, DXtemp in iter_derivatives(self.x, self.S, self.M, CHUNK):
+            if phases:
+                np.mod(Xtemp, 2*pi, out=Xtemp)
+            end = start + Xtemp.shape[1]
+            X[:,start:end] = Xtemp
+            DX[:,start:end] = DXtemp
+            start = end
+        return(X, DX)
+
+    def iter_inputs(self, MODEL=None, CHUNK=1, DTYPE=None):
+        '''
+         iter_inputs(MODEL,CHUNK,DTYPE) streams the input matrix X and the
+         time derivatives DX of inputs(MODEL,DTYPE) over groups of CHUNK time
+         series, without computing or caching them for the whole data set.
+        '''
+        if MODEL is None:
+            MODEL = self.MODEL
+        for Xtemp, DX in iter_derivatives(self.x, self.S, self.M, CHUNK, DTYPE):
+            if MODEL in ('kuramoto1', 'kuramoto2'):
+                np.mod(Xtemp, 2*pi, out=Xtemp)
+            yield Xtemp, DX
+
+    def fingerprint(self, MODEL=None, DTYPE=None):
+        '''
+         fingerprint(MODEL,DTYPE) returns a digest identifying the input
+         matrix employed for MODEL (see inputs), computed once. It keys the
+         expansions of the data set in an ExpansionCache.
+        '''
+        if MODEL is None:
+            MODEL = self.MODEL
+        X = self.inputs(MODEL, DTYPE)[0]
+        key = 'fingerprint-' + ('phases' if MODEL in ('kuramoto1', 'kuramoto2') else 'midpoints') \
+              + '-' + X.dtype.str
+        if key not in self._cache:
+            self._cache[key] = fingerprint(X)
+        return(self._cache[key])
+
+    def adjacency(self):
+        '''
+         adjacency() returns the connectivity as a dense matrix, or None if
+         it is not known.
+        '''
+        if sparse.issparse(self.connectivity):
+            return(self.connectivity.toarray())
+        return(self.connectivity)
+
+    @classmethod
+    def load(cls, DIR='Data'):
+        '''
+         Dataset.load(DIR) reads a data set written by simulate, either in
+         binary or in text form. Missing connectivity or frequencies are left
+         as None.
+        '''
+        x, S, M = load_data(DIR)
+        header = load_header(DIR)
+        MODEL = header.get('model') if header is not None else None
+        try:
+            connectivity = load_connectivity(DIR)
+        except IOError:
+            connectivity = None
+        frequencies = load_frequencies(DIR)
+        return(cls(x, S, M, MODEL, connectivity, frequencies))
+
+    def save(self, DIR='Data', FORMAT='npy'):
+        '''
+         save(DIR,FORMAT) writes the data set to DIR in binary (npy) or text
+         (dat) form, creating DIR if needed.
+        '''
+        if not os.path.isdir(DIR):
+            os.makedirs(DIR)
+        save_data(np.transpose(self.x), self.S, self.M, self.MODEL, DIR, FORMAT)
+        if self.connectivity is not None:
+            save_connectivity(self.connectivity, FORMAT, DIR)
+        if self.frequencies is not None:
+            save_frequencies(self.frequencies, FORMAT, DIR)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+import numpy as np
+
+def estimate_derivatives(x, S, M, DTYPE=None):
+    '''
+     estimate_derivatives(x,S,M,DTYPE) estimates time derivatives of the S
+     concatenated time series in x by forward differences, evaluated at the
+     midpoints of consecutive time points.
+
+     All time series are processed at once by viewing x as an array of size
+     [N,S,M], so that differences across the boundaries between consecutive
+     time series are never formed.
+
+     Parameters
+     ------------------
+     x: Matrix of size [N,M*S] containing all time series in a concatenated
+        form.
+     S: Number of different time series.
+     M: Number of time points per time series.
+     DTYPE: Floating point type of the results, e.g. float32. They are
+        computed in the type of x, whose differences lose precision in
+        float32, and then converted. The type of x is kept if None.
+
+     Input type
+     ------------------
+     x: double
+     S: integer
+     M: integer
+     DTYPE: numpy dtype or None
+
+     Output
+     ------------------
+     Xtemp: Matrix of size [N,(M-1)*S] containing the midpoints.
+     DX:    Matrix of size [N,(M-1)*S] containing the differences.
+
+     Accompanying material to "Model-free inference of direct interactions
+     from nonlinear collective dynamics".
+    '''
+    N = x.shape[0]
+    x = np.asarray(x[:,:S*M]).reshape(N, S, M)
+    x0 = x[:,:,:-1]
+    x1 = x[:,:,1:]
+
+    Xtemp = ((x0 + x1) * 0.5).reshape(N, S*(M-1))
+    DX = (x1 - x0).reshape(N, S*(M-1))
+    if DTYPE is not None:
+        Xtemp = Xtemp.astype(DTYPE, copy=False)
+        DX = DX.astype(DTYPE, copy=False)
+
+    return(Xtemp, DX)
+
+def iter_derivatives(x, S, M, CHUNK=1, DTYPE=None):
+    '''
+     iter_derivatives(x,S,M,CHUNK,DTYPE) estimates time derivatives like
+     estimate_derivatives, but streams over groups of CHUNK time series, so
+     that the midpoints and differences of all time series never have to be
+     in memory at once. If x is memory-mapped, only the time series of the
+     current group are read.
+
+     Output
+     ------------------
+     Generator of pairs (Xtemp, DX) of size [N,(M-1)*s], s<=CHUNK being the
+     number of time series in the group, in the order of the time series.
+
+     Example
+     ------------------
+     for Xtemp, DX in iter_derivatives(x,S,M,10): ... processes ten time
+     series at a time.
+    '''
+    for s in xrange(0, S, CHUNK):
+        s_end = min(s+CHUNK, S)
+        yield estimate_derivatives(x[:,M*s:M*s_end], s_end-s, M, DTYPE)
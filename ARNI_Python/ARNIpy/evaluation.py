@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+import numpy as np
+import sys
+
+from dataset import dimension
+
+def ground_truth(MODEL, CONNECTIVITY):
+    '''
+     ground_truth(MODEL,CONNECTIVITY) returns the true adjacency matrix to
+     which the inferred connections of a MODEL are compared: one where
+     CONNECTIVITY is nonzero, and on the diagonal for michaelis_menten, whose
+     degradation rate makes every unit regulate itself, and for models with
+     several state variables per unit (roessler), whose further variables
+     do so.
+    '''
+    adjacency = np.array(CONNECTIVITY != 0, dtype=float)
+    if MODEL == 'michaelis_menten' or dimension(MODEL) > 1:
+        np.fill_diagonal(adjacency, 1)
+    return(adjacency)
+
+def _ranking(nonzero, positives, SCORES):
+    # Ranks every row of SCORES in decreasing order, sorting its nonzero
+    # scores only, at the flattened positions nonzero: the zero scores of a row, i.e. its connections not
+    # inferred, form its last group of equal scores, ordered by unit. Returns,
+    # for every true connection, its row, its position in the ranking of its
+    # row, the first and last position of its group of equal scores, and
+    # whether it is inferred, for the true connections at the flattened
+    # positions positives
+    R, N = SCORES.shape
+    row = nonzero // N
+    values = SCORES.ravel()[nonzero]
+    order = np.lexsort((-values, row))
+    counts = np.bincount(row, minlength=R)
+    offsets = np.r_[0, np.cumsum(counts)[:-1]]
+
+    # groups of equal nonzero scores, rows start new groups
+    ranked, rows = values[order], row[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (ranked[1:] != ranked[:-1]) | (rows[1:] != rows[:-1])
+    starts = np.flatnonzero(first)
+    ends = np.r_[starts[1:], len(order)] - 1
+    group = np.cumsum(first) - 1
+    rank = np.empty(len(order), dtype=int)
+    rank[order] = np.arange(len(order))
+
+    row = positives // N
+    index = np.searchsorted(nonzero, positives)
+    found = index < len(nonzero)
+    inferred = np.zeros(len(positives), dtype=bool)
+    inferred[found] = nonzero[index[found]] == positives[found]
+    # not inferred: after the nonzero scores, ordered by unit
+    position = counts[row] + positives - N*row - (index - offsets[row])
+    start = counts[row].copy()
+    end = np.full(len(positives), N-1)
+    r = rank[index[inferred]]
+    position[inferred] = r - offsets[row[inferred]]
+    start[inferred] = starts[group[r]] - offsets[row[inferred]]
+    end[inferred] = ends[group[r]] - offsets[row[inferred]]
+    return(row, position, start, end, inferred)
+
+def _curves(LABELS, SCORES):
+    # ROC and precision-recall curves of every row, equal scores being taken
+    # together, so that ties give repeated points
+    R, N = SCORES.shape
+    order = np.argsort(-SCORES, axis=1, kind='mergesort')
+    rows = np.arange(R)[:,None]
+    ranked = SCORES[rows, order]
+    hits = LABELS[rows, order]
+    index = np.arange(R*N).reshape(R, N)
+    last = np.ones((R, N), dtype=bool)
+    last[:,:-1] = ranked[:,1:] != ranked[:,:-1]
+    end = np.minimum.accumulate(np.where(last, index, R*N).ravel()[::-1])[::-1]
+    tps = np.cumsum(hits, axis=1, dtype=float).ravel()[end].reshape(R, N)
+    fps = end.reshape(R, N) - N*rows + 1 - tps
+    P = tps[:,-1:]
+    zero = np.zeros((R, 1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return({'FPR': np.hstack((zero, fps/(N-P))), 'TPR': np.hstack((zero, tps/P)),
+                'precision': tps/(tps+fps), 'recall': tps/P})
+
+def _measures(LABELS, SCORES, K, CURVES, nonzero, positives):
+    # Evaluation of every row of SCORES against LABELS, see evaluate, given
+    # the flattened positions of the nonzero scores and of the true
+    # connections. Only the nonzero scores are sorted and only the true
+    # connections visited, so that no curve is built unless CURVES
+    R, N = SCORES.shape
+    row, position, start, end, inferred = _ranking(nonzero, positives, SCORES)
+    P = np.bincount(row, minlength=R).astype(float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # AUC by the average ranks of the true connections from the top:
+        # entries ranked below every one of them, ties counting one half,
+        # minus the pairs of true connections
+        U = np.bincount(row, N - 1 - (start + end)/2., minlength=R) - P*(P-1)/2
+        AUC = np.where((P > 0) & (P < N), U/(P*(N-P)), np.nan)
+        # average precision: precision at the score of every true
+        # connection, counting all true connections ranked up to its group
+        ranked = np.sort(N*row + position)
+        tps = np.searchsorted(ranked, N*row + end, 'right') - np.searchsorted(ranked, N*row)
+        AUPR = np.where(P > 0, np.bincount(row, tps/(end + 1.), minlength=R)/P, np.nan)
+
+    TP = np.bincount(row, inferred, minlength=R).astype(int)
+    FP = np.bincount(nonzero // N, minlength=R) - TP
+    FN = P.astype(int) - TP
+
+    measures = {'AUC': AUC, 'AUPR': AUPR,
+                'precision_at_k': np.bincount(row, position < K, minlength=R)/float(min(K, N)),
+                'TP': TP, 'FP': FP, 'FN': FN, 'TN': N - TP - FP - FN}
+    if CURVES:
+        measures.update(_curves(LABELS, SCORES))
+    return(measures)
+
+def evaluate(MODEL, SCORES, CONNECTIVITY, NODES=None, K=None, CURVES=False):
+    '''
+     evaluate(MODEL,SCORES,CONNECTIVITY,NODES,K,CURVES) evaluates the
+     reconstruction of a network against its true connectivity, for every
+     reconstructed unit and for the whole network, ranking the scores of all
+     units at once. Only the nonzero scores are sorted, and areas and counts
+     are computed from the ranks of the true connections, without building
+     the curves unless CURVES.
+
+     Parameters
+     ------------------
+     MODEL:        Dynamic model employed. Its adjacency conventions are
+                   applied to CONNECTIVITY, see ground_truth.
+     SCORES:       Scores of the inferred incoming connections of every
+                   unit, as returned by reconstruct_network. Their absolute
+                   values are ranked, and connections scoring zero are not
+                   inferred.
+     CONNECTIVITY: Weighted adjacency matrix of the network.
+     NODES:        Units to evaluate. Zero indexed. All units are evaluated
+                   if None.
+     K:            Number of top ranked connections of every unit whose
+                   precision is reported. The number of true incoming
+                   connections per unit, rounded, is used if None.
+     CURVES:       Whether to return the ROC and precision-recall curves,
+                   which take memory of the size of SCORES several times.
+
+     Input type
+     ------------------
+     MODEL:        string
+     SCORES:       matrix of size [N,N]
+     CONNECTIVITY: matrix of size [N,N], dense or scipy.sparse
+     NODES:        list of integers or None
+     K:            integer or None
+     CURVES:       boolean
+
+     Output
+     ------------------
+     nodes:   Dictionary with the evaluation of every unit in NODES, one row
+              or entry per unit:
+              FPR, TPR:          ROC curves, matrices of size [R,N+1]
+                                 (only with CURVES).
+              precision, recall: Precision-recall curves, matrices of size
+                                 [R,N] (only with CURVES).
+              AUC:               Areas under the ROC curves (nan for units
+                                 without true or without missing
+                                 connections).
+              AUPR:              Average precisions, i.e. areas under the
+                                 precision-recall curves (nan for units
+                                 without true connections).
+              precision_at_k:    Precision of the K top ranked connections.
+              TP, FP, FN, TN:    Numbers of true and false positives and
+                                 negatives of the inferred connections.
+              Equal scores are ranked together, so that the points of a
+              curve repeat over ties.
+     network: Dictionary with the same entries for all connections of the
+              units in NODES ranked together, as vectors and scalars, and
+              the precision of the K*R top ranked connections.
+
+     Example
+     ------------------
+     scores, _, _ = reconstruct_network('kuramoto2','fourier_diff',6)
+     nodes, network = evaluate('kuramoto2',scores,Dataset.load().adjacency())
+     yields the AUC score of every unit, nodes['AUC'], and of the whole
+     network, network['AUC'].
+
+     Accompanying material to "Model-free inference of direct interactions
+     from nonlinear collective dynamics".
+    '''
+
+    models=['kuramoto1', 'kuramoto2', 'michaelis_menten', 'roessler']
+    if (MODEL not in models):
+        sys.exit('ERROR: MODEL must be a valid string: kuramoto1')
+
+    if hasattr(CONNECTIVITY, 'toarray'):
+        CONNECTIVITY = CONNECTIVITY.toarray()
+    SCORES = np.abs(np.asarray(SCORES, dtype=float))
+    if SCORES.shape != CONNECTIVITY.shape:
+        raise ValueError('SCORES and CONNECTIVITY must have the same shape')
+    LABELS = ground_truth(MODEL, CONNECTIVITY) != 0
+    if NODES is not None:
+        SCORES = SCORES[NODES,:]
+        LABELS = LABELS[NODES,:]
+    R = SCORES.shape[0]
+    if K is None:
+        K = max(1, int(round(np.count_nonzero(LABELS)/float(R))))
+
+    # the flattened positions are those of the whole network as one row
+    nonzero = np.flatnonzero(SCORES)
+    positives = np.flatnonzero(LABELS)
+    nodes = _measures(LABELS, SCORES, K, CURVES, nonzero, positives)
+    network = _measures(LABELS.reshape(1, -1), SCORES.reshape(1, -1), K*R,
+                        CURVES, nonzero, positives)
+    for name, value in network.items():
+        network[name] = value[0]
+
+    return(nodes, network)
+
+
+if __name__ == "__main__":
+    import unittest
+    from numpy.testing import assert_almost_equal, assert_equal
+
+    # true incoming connections of 4 units and scores whose measures are
+    # worked out by hand, with ties within the nonzero and the zero scores
+    CONNECTIVITY = np.array([[0, 1, 0, 1],
+                             [1, 0, 0, 0],
+                             [1, 1, 0, 0],
+                             [0, 0, 1, 0]])
+    SCORES = np.array([[ 0., 0.9, 0.5, 0.2],
+                       [ 0., 0.3, 0.3, 0. ],
+                       [0.4, 0.4,  0., 0.1],
+                       [0.2,  0., 0.2,-0.7]])
+
+    class TestEvaluate(unittest.TestCase):
+        def test_nodes(self):
+            nodes, _ = evaluate('kuramoto1', SCORES, CONNECTIVITY)
+            assert_almost_equal(nodes['AUC'], [3/4., 1/6., 1., 1/2.])
+            assert_almost_equal(nodes['AUPR'], [5/6., 1/4., 1., 1/3.])
+            # K is 6 true connections over 4 units, rounded
+            assert_almost_equal(nodes['precision_at_k'], [1/2., 0., 1., 0.])
+            assert_equal(nodes['TP'], [2, 0, 2, 1])
+            assert_equal(nodes['FP'], [1, 2, 1, 2])
+            assert_equal(nodes['FN'], [0, 1, 0, 0])
+            assert_equal(nodes['TN'], [1, 1, 1, 1])
+
+        def test_network(self):
+            _, network = evaluate('kuramoto1', SCORES, CONNECTIVITY)
+            self.assertAlmostEqual(network['AUC'], 39/60.)
+            self.assertAlmostEqual(network['AUPR'], (1 + 2*3/5. + 2*5/10. + 6/16.)/6)
+            self.assertAlmostEqual(network['precision_at_k'], 4/8.)
+            assert_equal([network[name] for name in ('TP', 'FP', 'FN', 'TN')],
+                         [5, 6, 1, 4])
+
+        def test_subset(self):
+            nodes, network = evaluate('kuramoto1', SCORES, CONNECTIVITY, NODES=[0, 2])
+            assert_almost_equal(nodes['AUC'], [3/4., 1.])
+            assert_equal(nodes['TP'], [2, 2])
+            self.assertAlmostEqual(network['AUC'], 13/16.)
+            self.assertAlmostEqual(network['precision_at_k'], 3/4.)
+
+        def test_large_k(self):
+            # K beyond the number of units counts every true connection
+            nodes, network = evaluate('kuramoto1', SCORES, CONNECTIVITY, K=10)
+            assert_almost_equal(nodes['precision_at_k'], [2/4., 1/4., 2/4., 1/4.])
+            self.assertAlmostEqual(network['precision_at_k'], 6/16.)
+
+        def test_curves(self):
+            nodes, network = evaluate('kuramoto1', SCORES, CONNECTIVITY, CURVES=True)
+            assert_almost_equal(nodes['FPR'][0], [0., 0., 1/2., 1/2., 1.])
+            assert_almost_equal(nodes['TPR'][0], [0., 1/2., 1/2., 1., 1.])
+            assert_almost_equal(nodes['precision'][2], [1., 1., 2/3., 1/2.])
+            self.assertAlmostEqual(np.trapz(network['TPR'], network['FPR']), network['AUC'])
+
+    unittest.main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+from collections import OrderedDict
+import hashlib
+import numpy as np
+
+from basis_expansion import basis_expansion
+
+# Bases whose expansion depends on the unit upon the reconstruction takes place
+NODE_BASES = ('polynomial_diff', 'fourier_diff', 'power_series', 'RBF')
+
+def fingerprint(X):
+    '''
+     fingerprint(X) returns a SHA-1 digest identifying the content, shape and
+     dtype of the array X.
+    '''
+    X = np.ascontiguousarray(X)
+    h = hashlib.sha1(str(X.shape) + X.dtype.str)
+    h.update(X.data)
+    return(h.hexdigest())
+
+class ExpansionCache(object):
+    '''
+     ExpansionCache(MAXBYTES) caches basis expansions, so that repeated
+     reconstructions on the same data reuse them instead of evaluating
+     basis_expansion again.
+
+     Expansions are keyed on a fingerprint of the data, the basis and the
+     order, and on the unit only for bases that depend on it (see
+     NODE_BASES); polynomial and fourier expansions are thus shared by all
+     units. The least recently used expansions are evicted once the cached
+     expansions take more than MAXBYTES bytes. Cached expansions are
+     read-only.
+
+     Parameters
+     ------------------
+     MAXBYTES: Memory budget of the cache in bytes.
+
+     Input type
+     ------------------
+     MAXBYTES: integer
+
+     Example
+     ------------------
+     cache = ExpansionCache(2**30)
+     reconstruct('kuramoto1',NODE,'fourier',6,DATA=data,CACHE=cache) for
+     every NODE expands the data only once. cache.stats() reports the hits
+     and misses.
+    '''
+    def __init__(self, MAXBYTES=2**30):
+        self.MAXBYTES = MAXBYTES
+        self._entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def basis_expansion(self, X, K, TYPE, NODE, KEY=None, CENTERS=None, RANK=None):
+        '''
+         basis_expansion(X,K,TYPE,NODE,KEY,CENTERS,RANK) returns
+         basis_expansion(X,K,TYPE,NODE,CENTERS=CENTERS,RANK=RANK), from the
+         cache if possible. KEY identifies X, e.g. as given by
+         Dataset.fingerprint; it is computed from X if None.
+        '''
+        if KEY is None:
+            KEY = fingerprint(X)
+        key = (KEY, TYPE, K, NODE if TYPE in NODE_BASES else None)
+        if TYPE == 'RBF':
+            if CENTERS is not None and not isinstance(CENTERS, basestring):
+                CENTERS_KEY = fingerprint(CENTERS)
+            else:
+                CENTERS_KEY = CENTERS
+            key += (CENTERS_KEY, RANK)
+
+        if key in self._entries:
+            self.hits += 1
+            # move to the most recently used end
+            Expansion = self._entries.pop(key)
+            self._entries[key] = Expansion
+            return(Expansion)
+
+        self.misses += 1
+        Expansion = basis_expansion(X, K, TYPE, NODE, CENTERS=CENTERS, RANK=RANK)
+        if Expansion.nbytes <= self.MAXBYTES:
+            Expansion.flags.writeable = False
+            self._entries[key] = Expansion
+            self.nbytes += Expansion.nbytes
+            while self.nbytes > self.MAXBYTES:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+
+        return(Expansion)
+
+    def stats(self):
+        '''
+         stats() returns a dictionary with the number of hits, misses and
+         evictions, and the number and size in bytes of the cached
+         expansions.
+        '''
+        return({'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'entries': len(self._entries),
+                'bytes': self.nbytes})
+
+    def clear(self):
+        '''
+         clear() drops all cached expansions.
+        '''
+        self._entries.clear()
+        self.nbytes = 0
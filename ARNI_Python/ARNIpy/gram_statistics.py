@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+import numpy as np
+from scipy import sparse
+
+from basis_expansion import basis_expansion, basis_size, rbf_centers
+from dataset import dimension
+from profiling import NO_PROFILE
+
+class GramStatistics(object):
+    '''
+     GramStatistics(K,N) accumulates the sufficient statistics of the
+     least-squares fits performed by the greedy search of ARNI: the Gram
+     matrix of the stacked basis expansion, its cross-products with the time
+     derivatives, and the sums needed for the standard deviation of the
+     residuals. Their size, [N*K,N*K], does not depend on the number of time
+     points, and statistics of disjoint groups of time points add up. They
+     are accumulated in float64 whatever the type of the expansion, since
+     the Gram matrix squares its condition number.
+
+     Parameters
+     ------------------
+     K: Number of basis functions per incoming connection, i.e.
+        basis_size(ORDER,BASIS) times the number of state variables D of
+        every unit.
+     N: Number of possible incoming connections.
+
+     Input type
+     ------------------
+     K: integer
+     N: integer
+
+     Attributes
+     ------------------
+     G:   Gram matrix of size [N*K,N*K] of the expansion, rows ordered by
+          connection and then by basis function.
+     b:   Cross-products of the expansion with the time derivatives.
+     d:   Sum of squares of the time derivatives.
+     sY:  Sums of the expansion over the time points.
+     sDX: Sum of the time derivatives.
+     L:   Number of time points accumulated.
+
+     Example
+     ------------------
+     stats = GramStatistics(7,N); stats.update(basis_expansion(X,6,
+     'polynomial',10),DX[10,:]) for every group of time series, followed by
+     greedy_search_gram(stats,M), ranks the incoming connections of unit 10.
+    '''
+    def __init__(self, K, N):
+        self.K = K
+        self.N = N
+        self.G = np.zeros((N*K, N*K))
+        self.b = np.zeros(N*K)
+        self.d = 0.
+        self.sY = np.zeros(N*K)
+        self.sDX = 0.
+        self.L = 0
+
+    def update(self, Y, DX):
+        '''
+         update(Y,DX) adds the time points of the expansion Y, of size
+         [K/D,L,N*D], and of the time derivatives DX, of size [L], to the
+         statistics. The expansions of the D state variables of every unit
+         form its block.
+        '''
+        L = Y.shape[1]
+        Yf = np.asarray(np.transpose(Y, (2, 0, 1)).reshape(self.N*self.K, L), float)
+        DX = np.asarray(DX, float)
+        self.G += Yf.dot(Yf.T)
+        self.b += Yf.dot(DX)
+        self.d += DX.dot(DX)
+        self.sY += Yf.sum(axis=1)
+        self.sDX += DX.sum()
+        self.L += L
+        return(self)
+
+    def __add__(self, other):
+        stats = GramStatistics(self.K, self.N)
+        for name in ('G', 'b', 'd', 'sY', 'sDX', 'L'):
+            setattr(stats, name, getattr(self, name) + getattr(other, name))
+        return(stats)
+
+    def __iadd__(self, other):
+        self.G += other.G
+        self.b += other.b
+        self.d += other.d
+        self.sY += other.sY
+        self.sDX += other.sDX
+        self.L += other.L
+        return(self)
+
+def stream_statistics(DATA, MODEL, NODE, BASIS, ORDER, CHUNK=1,
+                      PROFILE=None, CENTERS=None, RANK=None, DTYPE=None):
+    '''
+     stream_statistics(DATA,MODEL,NODE,BASIS,ORDER,CHUNK,PROFILE,CENTERS,
+     RANK,DTYPE) accumulates the GramStatistics of unit NODE by walking the
+     data set in groups of CHUNK time series, so that only the expansion of
+     one group is in memory at a time. For memory-mapped data sets, only the
+     current group is read. For units of several state variables (see
+     dimension), the time derivatives of the first one are fitted and the
+     expansions of all variables of a unit form its block.
+
+     Parameters
+     ------------------
+     DATA:  Dataset to reconstruct from.
+     MODEL: Dynamic model employed. See reconstruct.
+     NODE:  Unit upon the reconstruction takes place. Zero indexed.
+     BASIS: Type of basis employed. See reconstruct.
+     ORDER: Number of basis in the expansion.
+     CHUNK: Number of time series per group.
+     PROFILE: Profile in which reading and differentiating (derivatives),
+            expanding (expansion) and accumulating (statistics) every group
+            are recorded. Nothing is measured if None.
+     CENTERS: For RBF, selection of the centers. See basis_expansion. The
+            centers are selected on the leading groups that supply ORDER
+            time points, see leading_centers.
+     RANK:  For RBF, number of Nystroem features. See basis_expansion.
+     DTYPE: Floating point type in which the time derivatives and the
+            expansion of every group are computed, e.g. float32. The type of
+            the data set is kept if None.
+
+     Input type
+     ------------------
+     DATA:  Dataset
+     MODEL: string
+     NODE:  integer
+     BASIS: string
+     ORDER: integer
+     CHUNK: integer
+     PROFILE: Profile or None
+     CENTERS: string, double or None
+     RANK:  integer or None
+     DTYPE: numpy dtype or None
+
+     Output
+     ------------------
+     stats: GramStatistics of the whole data set.
+    '''
+    D = dimension(MODEL)
+    stats = GramStatistics(D*basis_size(ORDER, BASIS, RANK), DATA.N // D)
+    for part in iter_statistics(DATA, MODEL, NODE, BASIS, ORDER, CHUNK,
+                                PROFILE, CENTERS, RANK, DTYPE):
+        stats += part
+    return(stats)
+
+def iter_statistics(DATA, MODEL, NODE, BASIS, ORDER, CHUNK=1, PROFILE=None,
+                    CENTERS=None, RANK=None, DTYPE=None):
+    '''
+     iter_statistics(DATA,MODEL,NODE,BASIS,ORDER,CHUNK,PROFILE,CENTERS,RANK,
+     DTYPE) yields the GramStatistics of every group of CHUNK time series
+     separately, e.g. the statistics of every time series with CHUNK=1, from
+     which the statistics of any resampling of the time series are weighted
+     sums. The parameters are those of stream_statistics.
+    '''
+    D = dimension(MODEL)
+    K = D*basis_size(ORDER, BASIS, RANK)
+    if PROFILE is None:
+        PROFILE = NO_PROFILE
+    for group, Y, DX in _expansions(DATA, MODEL, NODE, BASIS, ORDER, CHUNK,
+                                    PROFILE, CENTERS, RANK, DTYPE):
+        with PROFILE.phase('statistics', group=group):
+            stats = GramStatistics(K, DATA.N // D).update(Y, DX)
+        yield stats
+
+def sketch_statistics(DATA, MODEL, NODE, BASIS, ORDER, SIZE, SEED=None,
+                      CHUNK=1, PROFILE=None, CENTERS=None, RANK=None,
+                      DTYPE=None, NONZEROS=8):
+    '''
+     sketch_statistics(DATA,MODEL,NODE,BASIS,ORDER,SIZE,SEED,CHUNK,PROFILE,
+     CENTERS,RANK,DTYPE,NONZEROS) approximates the GramStatistics of unit
+     NODE by those of a random sketch of the time points: every time point
+     of the expansion and of the time derivatives is added, with random
+     signs, to NONZEROS of SIZE sketched time points drawn at random (a
+     sparse sign embedding), so that inner products are preserved in
+     expectation. The data set is streamed as in stream_statistics, and the
+     Gram matrix is formed from the SIZE sketched time points instead of all
+     of them. The sums of the expansion and of the time derivatives, and the
+     number of time points, are kept exact.
+
+     Parameters
+     ------------------
+     SIZE:     Number of sketched time points, e.g. a few thousands.
+     SEED:     Seed of the random generator drawing the sketch.
+     NONZEROS: Number of sketched time points every time point is added to.
+     The other parameters are those of stream_statistics.
+
+     Input type
+     ------------------
+     SIZE:     integer
+     SEED:     integer or None
+     NONZEROS: integer
+
+     Output
+     ------------------
+     stats: GramStatistics of the sketch.
+    '''
+    D = dimension(MODEL)
+    K = D*basis_size(ORDER, BASIS, RANK)
+    N = DATA.N // D
+    NONZEROS = min(NONZEROS, SIZE)
+    if PROFILE is None:
+        PROFILE = NO_PROFILE
+    random = np.random.RandomState(SEED)
+    SY = np.zeros((SIZE, N*K))
+    SDX = np.zeros(SIZE)
+    stats = GramStatistics(K, N)
+    for group, Y, DX in _expansions(DATA, MODEL, NODE, BASIS, ORDER, CHUNK,
+                                    PROFILE, CENTERS, RANK, DTYPE):
+        with PROFILE.phase('statistics', group=group):
+            L = Y.shape[1]
+            rows = random.randint(0, SIZE, size=NONZEROS*L)
+            signs = random.choice((-1., 1.), size=NONZEROS*L) / np.sqrt(NONZEROS)
+            Sk = sparse.csr_matrix((signs, (rows, np.repeat(np.arange(L), NONZEROS))),
+                                   shape=(SIZE, L))
+            Yf = np.asarray(np.transpose(Y, (1, 2, 0)).reshape(L, N*K), float)
+            DX = np.asarray(DX, float)
+            SY += Sk.dot(Yf)
+            SDX += Sk.dot(DX)
+            stats.sY += Yf.sum(axis=0)
+            stats.sDX += DX.sum()
+            stats.L += L
+    stats.G = SY.T.dot(SY)
+    stats.b = SY.T.dot(SDX)
+    stats.d = SDX.dot(SDX)
+    return(stats)
+
+def _expansions(DATA, MODEL, NODE, BASIS, ORDER, CHUNK, PROFILE, CENTERS,
+                RANK, DTYPE):
+    # Yields the basis expansion of every group of CHUNK time series, with
+    # the time derivatives of unit NODE
+    D = dimension(MODEL)
+    ROW = D*NODE
+    centers = None
+    if BASIS == 'RBF':
+        centers = leading_centers(DATA, MODEL, ORDER, ROW, CENTERS, CHUNK, DTYPE)
+    groups = DATA.iter_inputs(MODEL, CHUNK, DTYPE)
+    for group in xrange(0, DATA.S, CHUNK):
+        with PROFILE.phase('derivatives', group=group):
+            X, DX = next(groups)
+        with PROFILE.phase('expansion', group=group):
+            Y = basis_expansion(X, ORDER, BASIS, ROW, CENTERS=centers, RANK=RANK)
+        yield group, Y, DX[ROW,:]
+
+def leading_centers(DATA, MODEL, K, ROW, CENTERS=None, CHUNK=1, DTYPE=None):
+    '''
+     leading_centers(DATA,MODEL,K,ROW,CENTERS,CHUNK,DTYPE) selects the K
+     centers of the radial basis functions of the state variable ROW, shared
+     by all groups of a streamed data set, on the leading groups of CHUNK
+     time series that supply at least K time points. With the first centers
+     (CENTERS None or first), they are the first K time points of the data
+     set whatever CHUNK, as without streaming. Centers given as an array
+     are returned unchanged.
+    '''
+    if not (CENTERS is None or isinstance(CENTERS, basestring)):
+        return(CENTERS)
+    parts = []
+    for X, DX in DATA.iter_inputs(MODEL, CHUNK, DTYPE):
+        parts.append(X)
+        if sum(X.shape[1] for X in parts) >= K:
+            break
+    return(rbf_centers(np.hstack(parts), K, ROW, CENTERS or 'first'))
@@ -0,0 +1,515 @@
+#!/usr/bin/env python
+import numpy as np
+
+from profiling import NO_PROFILE
+
+def greedy_search(Y, DX, M, th=0.0001, SCREEN=None, READMIT=True,
+                  PROFILE=None, D=1):
+    '''
+     greedy_search(Y,DX,M,th,SCREEN,READMIT,PROFILE,D) performs the greedy
+     subspace search of ARNI and returns a ranked list of the inferred
+     incoming connections.
+
+     Instead of composing the inferred subspaces and computing the
+     pseudo-inverse of every possible composite space, an orthogonal
+     factorization of the accepted blocks is kept and updated. Every
+     remaining block is stored as its projection onto the orthogonal
+     complement of the accepted subspace, so that scoring a candidate only
+     requires an orthonormal basis of its own K rows.
+
+     For networks of many units, the candidates can be pre-screened: before
+     the first iteration, every candidate is scored at once, from the Gram
+     matrices of the blocks, by the projection error onto its own block of
+     what the block of the first iteration, typically the unit itself,
+     leaves of the time derivatives, and only that block and the SCREEN
+     best others are searched. If READMIT is set, the next SCREEN pruned candidates (in the
+     order of their marginal scores) are re-admitted whenever the search
+     runs out of candidates or the stopping criterium is met, until this no
+     longer improves the fit.
+
+     For units of D state variables, the expansions of the variables of
+     every unit are searched as one block, so that candidates are units.
+
+     The search runs in the floating point type of Y, e.g. float32 for
+     expansions computed with DTYPE=float32, with the rank tolerances taken
+     from that type and the rows of every block equilibrated. Projection
+     errors and costs are always reduced in float64.
+
+     Parameters
+     ------------------
+     Y:  Multidimensional array of size [K,M*S,N*D] containing the basis
+         expansion for all possible incoming connections, as returned by
+         basis_expansion.
+     DX: Time derivatives of the unit upon the reconstruction takes place.
+     M:  Number of time points per time series, used to normalize the
+         fitting cost.
+     th: Stopping criterium: decrease it to recover longer list of possible
+         links.
+     SCREEN:  Number of candidates kept by the pre-screening. All are kept if
+              None.
+     READMIT: Whether pruned candidates are re-admitted.
+     PROFILE: Profile in which every iteration is recorded, with its number
+              of candidates. Nothing is measured if None.
+     D:  Number of state variables of every unit.
+
+     Input type
+     ------------------
+     Y:  double
+     DX: double
+     M:  integer
+     th: double
+     SCREEN:  integer or None
+     READMIT: boolean
+     PROFILE: Profile or None
+     D:  integer
+
+     Output
+     ------------------
+     llist: Sequence of inferred interactions in the order such were
+            detected.
+     cost:  Fitting cost for all inferred interactions in the order such
+            were detected.
+     vec:   Projection error of every inferred interaction at the moment it
+            was detected (zero for non-inferred ones), used in ROC curves.
+
+     Example
+     ------------------
+     greedy_search(basis_expansion(X,6,'polynomial',10),DX[10,:],10) ranks
+     the incoming connections of unit 10 using polynomials up to power 6.
+
+     Accompanying material to "Model-free inference of direct interactions
+     from nonlinear collective dynamics".
+    '''
+
+    K, L, N = Y.shape
+    # the D variables of a unit make up its block
+    K, N = D*K, N//D
+    dtype = np.result_type(Y.dtype, np.float32)
+
+    nolist = range(N)
+    llist = []
+    cost = []
+    vec = np.zeros(N,)
+
+    # Candidate blocks projected onto the orthogonal complement of the
+    # accepted subspace, B[candidate, basis, sample]
+    B = np.array(np.transpose(Y, (2, 0, 1)), dtype=dtype).reshape(N, K, L)
+    if dtype != np.float64:
+        # Rows of polynomial expansions span many orders of magnitude, more
+        # than single precision resolves: equilibrate them, which leaves the
+        # subspaces unchanged
+        norms = np.sqrt(np.einsum('ckl,ckl->ck', B, B, dtype=float))
+        norms[norms == 0] = 1
+        B /= norms[:,:,None].astype(dtype)
+    # Residual of DX after projection on the accepted subspace
+    r = np.array(DX, dtype=dtype)
+    screen = _Screening(N, SCREEN, READMIT)
+    if PROFILE is None:
+        PROFILE = NO_PROFILE
+
+    # Only the candidates that best explain what the first accepted block
+    # leaves of DX are searched; the pruned blocks are kept as they are, and
+    # projected when re-admitted
+    if screen.screens(N):
+        with PROFILE.phase('screening', candidates=N):
+            first, P = _screening(np.einsum('ckl,cjl->ckj', B, B, dtype=float),
+                                  np.einsum('ckl,l->ck', B, r, dtype=float),
+                                  np.dot(r, r.astype(float)), np.sum(r, dtype=float),
+                                  np.sum(B, axis=2, dtype=float), L,
+                                  lambda c: np.einsum('kl,cjl->ckj', B[c], B, dtype=float))
+            survivors = screen.prune(P, nolist, first)
+            Bp, B = B[screen.positions], B[survivors]
+            nolist = [nolist[i] for i in survivors]
+
+    # Rank tolerance of each candidate, taken from its original block
+    tol = _tolerance(B)
+    # Orthonormal basis of the accepted subspace
+    Qall = np.zeros((0, L), dtype)
+
+    while nolist:
+        with PROFILE.phase('iteration', iteration=screen.iterations,
+                           candidates=len(nolist)):
+            # Orthonormal basis of every projected candidate block
+            _, s, Vt = np.linalg.svd(B, full_matrices=False)
+            keep = s > tol[:,None]
+            A = np.einsum('ckl,l->ck', Vt, r) * keep
+            DIFF = r[None,:] - np.einsum('ck,ckl->cl', A, Vt)
+            P = np.std(DIFF, axis=1, dtype=float)
+            screen.evaluated(len(nolist))
+
+            # break if all candidates equivalent, unless pruned candidates
+            # can still be re-admitted
+            if np.std(P) < th:
+                batch = screen.readmit(stalled=True)
+                if not batch:
+                    break
+                B, tol, Bp = _readmit(B, tol, Bp, len(batch), Qall)
+                nolist += batch
+                continue
+            screen.stalled = False
+
+            # Selection of composite space which minimises projection error
+            block = np.argmin(P)
+            llist.append(nolist[block])
+            vec[nolist[block]] = P[block]
+            cost.append((1/float(M)) * np.linalg.norm(DIFF[block].astype(float)))
+
+            # Extend the orthogonal factorization by the new directions and
+            # project them out of the remaining candidates
+            Q = Vt[block][keep[block]]
+            Qall = np.vstack((Qall, Q))
+            r = DIFF[block]
+            del nolist[block]
+            B = np.delete(B, block, axis=0)
+            tol = np.delete(tol, block)
+            B -= np.einsum('ckq,ql->ckl', np.einsum('ckl,ql->ckq', B, Q), Q)
+
+            if not nolist:
+                batch = screen.readmit(stalled=False)
+                if batch:
+                    B, tol, Bp = _readmit(B, tol, Bp, len(batch), Qall)
+                    nolist += batch
+
+    screen.report()
+    return(llist, cost, vec)
+
+def greedy_search_gram(stats, M, th=0.0001, SCREEN=None, READMIT=True,
+                       PROFILE=None, WARM=()):
+    '''
+     greedy_search_gram(stats,M,th,SCREEN,READMIT,PROFILE,WARM) performs the
+     greedy subspace search of ARNI like greedy_search, but on the
+     GramStatistics of the expansion instead of the expansion itself, so
+     that its cost does not depend on the number of time points.
+
+     The accepted subspace is represented by the inner products of its
+     orthonormal directions with every row of the expansion, from which the
+     Gram matrix of every projected candidate block, and hence the
+     projection error of the time derivatives, follows. Since the fits are
+     solved through Gram matrices, directions whose squared singular value
+     is below the precision of the Gram matrix are discarded; results agree
+     with greedy_search up to this precision.
+
+     Parameters
+     ------------------
+     stats: GramStatistics of the expansion and of the time derivatives of
+            the unit upon the reconstruction takes place.
+     M:     Number of time points per time series, used to normalize the
+            fitting cost.
+     th:    Stopping criterium: decrease it to recover longer list of
+            possible links.
+     SCREEN:  Number of candidates kept by the pre-screening, which scores
+              every candidate block on the Gram statistics. See
+              greedy_search.
+     READMIT: Whether pruned candidates are re-admitted.
+     PROFILE: Profile in which every iteration is recorded, with its number
+              of candidates. Nothing is measured if None.
+     WARM:    Candidates inferred by a previous search, e.g. on part of the
+              time series, which the screening keeps whatever their
+              marginal projection error.
+
+     Input type
+     ------------------
+     stats: GramStatistics
+     M:     integer
+     th:    double
+     SCREEN:  integer or None
+     READMIT: boolean
+     PROFILE: Profile or None
+     WARM:    list of integers
+
+     Output
+     ------------------
+     llist: Sequence of inferred interactions in the order such were
+            detected.
+     cost:  Fitting cost for all inferred interactions in the order such
+            were detected.
+     vec:   Projection error of every inferred interaction at the moment it
+            was detected (zero for non-inferred ones), used in ROC curves.
+    '''
+
+    K, N, L = stats.K, stats.N, stats.L
+    eps = np.finfo(float).eps
+
+    nolist = range(N)
+    llist = []
+    cost = []
+    vec = np.zeros(N,)
+
+    # The rows of the expansion are equilibrated, which leaves the subspaces
+    # unchanged but keeps the eigenvalues of large blocks, e.g. of units of
+    # several state variables, above the rank tolerance
+    scale = np.sqrt(np.diag(stats.G))
+    scale[scale == 0] = 1
+    scale = 1/scale
+    G = stats.G * scale[:,None] * scale[None,:]
+
+    # Gram matrix of every candidate block, Gc[candidate, basis, basis]
+    idx = np.arange(N*K).reshape(N, K)
+    Gc = G[idx[:,:,None], idx[:,None,:]]
+    tol = np.linalg.eigvalsh(Gc)[:,-1] * K * eps
+    # Inner products of the accepted orthonormal directions with every row
+    # of the expansion, C[direction, candidate, basis], and their sums
+    C = np.zeros((0, N, K))
+    qs = np.zeros(0)
+    # Cross-products of the residual with every row, its sum of squares and
+    # its sum
+    rb = (stats.b * scale).reshape(N, K)
+    rr = stats.d
+    rs = stats.sDX
+    sY = (stats.sY * scale).reshape(N, K)
+    screen = _Screening(N, SCREEN, READMIT, WARM)
+    if PROFILE is None:
+        PROFILE = NO_PROFILE
+
+    if screen.screens(N):
+        with PROFILE.phase('screening', candidates=N):
+            first, P = _screening(Gc, rb, rr, rs, sY, L,
+                                  lambda c: G[idx[c]].reshape(K, N, K).transpose(1, 0, 2))
+            survivors = screen.prune(P, nolist, first)
+            nolist = [nolist[i] for i in survivors]
+
+    while nolist:
+        with PROFILE.phase('iteration', iteration=screen.iterations,
+                           candidates=len(nolist)):
+            # Orthonormal basis of every projected candidate block
+            B = Gc[nolist] - np.einsum('qck,qcl->ckl', C[:,nolist], C[:,nolist])
+            sZ = sY[nolist] - np.tensordot(qs, C[:,nolist], 1)
+            P, SS, A, U, W, keep = _errors(B, rb[nolist], rr, rs, sZ, L, tol[nolist])
+            screen.evaluated(len(nolist))
+
+            # break if all candidates equivalent, unless pruned candidates
+            # can still be re-admitted
+            if np.std(P) < th:
+                batch = screen.readmit(stalled=True)
+                if not batch:
+                    break
+                nolist += batch
+                continue
+            screen.stalled = False
+
+            # Selection of composite space which minimises projection error
+            block = np.argmin(P)
+            c = nolist[block]
+            llist.append(c)
+            vec[c] = P[block]
+            cost.append((1/float(M)) * np.sqrt(SS[block]))
+
+            # Extend the accepted subspace by the new directions
+            Wc = W[block][keep[block]]
+            Cnew = np.dot(Wc, G[idx[c]] - np.dot(C[:,c].T, C.reshape(-1, N*K)))
+            C = np.concatenate((C, Cnew.reshape(-1, N, K)))
+            qs = np.concatenate((qs, U[block][keep[block]]))
+            a = A[block][keep[block]]
+            rb -= np.dot(a, Cnew).reshape(N, K)
+            rr = SS[block]
+            rs -= np.dot(a, U[block][keep[block]])
+            del nolist[block]
+
+            if not nolist:
+                nolist += screen.readmit(stalled=False)
+
+    screen.report()
+    return(llist, cost, vec)
+
+def _errors(Gc, b, d, s, sY, L, tol):
+    # Projection errors of the residual onto every projected candidate block,
+    # from the Gram matrix Gc[candidate, basis, basis] of every block, its
+    # cross-products b with the residual and its sums sY over the L time
+    # points, and the sum of squares d and the sum s of the residual. Returns
+    # them with the sum of squares SS of every fit, the coefficients A and
+    # sums U of the residual and of the rows in the orthonormal directions W
+    # of every block, and the directions kept, keep
+    lam, V = np.linalg.eigh(Gc)
+    keep = lam > tol[:,None]
+    W = np.transpose(V, (0, 2, 1))
+    W *= (keep / np.sqrt(np.where(keep, lam, 1.)))[:,:,None]
+    A = np.einsum('cjk,ck->cj', W, b)
+    U = np.einsum('cjk,ck->cj', W, sY)
+    SS = np.maximum(d - np.sum(A*A, axis=1), 0.)
+    P = np.sqrt(np.maximum(SS/L - ((s - np.sum(A*U, axis=1))/L)**2, 0.))
+    return(P, SS, A, U, W, keep)
+
+def _screening(Gc, b, d, s, sY, L, cross):
+    # Projection errors of the second iteration of the greedy search, for
+    # all candidates at once, from the Gram statistics of their blocks (see
+    # _errors) and cross(c), the inner products cross[candidate, basis of c,
+    # basis] of the rows of block c with those of every block: the block of
+    # smallest error is accepted first, and the others are scored on what it
+    # leaves of the time derivatives. Returns the first block and the errors.
+    # The rows of the blocks are equilibrated, which leaves the errors
+    # unchanged
+    N, K = b.shape
+    scale = np.sqrt(np.einsum('ckk->ck', Gc))
+    scale[scale == 0] = 1
+    scale = 1/scale
+    Gc = Gc * scale[:,:,None] * scale[:,None,:]
+    b, sY = b*scale, sY*scale
+    tol = np.linalg.eigvalsh(Gc)[:,-1] * K * np.finfo(float).eps
+    P, SS, A, U, W, keep = _errors(Gc, b, d, s, sY, L, tol)
+
+    c = np.argmin(P)
+    Wc, a, u = W[c][keep[c]], A[c][keep[c]], U[c][keep[c]]
+    C = np.einsum('qk,ckj->qcj', Wc, cross(c) * scale[c][None,:,None] * scale[:,None,:])
+    P = _errors(Gc - np.einsum('qck,qcl->ckl', C, C), b - np.tensordot(a, C, 1),
+                SS[c], s - np.dot(a, u), sY - np.tensordot(u, C, 1), L, tol)[0]
+    return(c, P)
+
+def _tolerance(B):
+    # Rank tolerance of every block B[candidate, basis, sample]
+    K, L = B.shape[1:]
+    return(np.linalg.svd(B, compute_uv=False)[:,0] * max(K, L) * np.finfo(B.dtype).eps)
+
+def _readmit(B, tol, Bp, n, Qall):
+    # Moves the first n pruned blocks Bp to the candidate blocks B, projected
+    # onto the orthogonal complement of the accepted subspace
+    Bn = Bp[:n] - np.einsum('ckq,ql->ckl',
+                            np.einsum('ckl,ql->ckq', Bp[:n], Qall), Qall)
+    B = np.concatenate((B, Bn))
+    tol = np.concatenate((tol, _tolerance(Bp[:n])))
+    return(B, tol, Bp[n:])
+
+class _Screening(object):
+    # Bookkeeping of the candidate pre-screening of the greedy search
+    def __init__(self, N, SCREEN, READMIT, WARM=()):
+        self.N = N
+        self.SCREEN = SCREEN
+        self.READMIT = READMIT
+        self.WARM = list(WARM)
+        self.pruned = []
+        self.kept = None
+        self.readmitted = 0
+        self.iterations = 0
+        self.work = 0
+        self.stalled = False
+
+    def evaluated(self, n):
+        self.iterations += 1
+        self.work += n
+
+    def screens(self, n):
+        # Whether n candidates are too many to be all searched
+        return(self.SCREEN is not None and n > self.SCREEN + 1)
+
+    def prune(self, P, nolist, first):
+        # Returns the positions in nolist of the candidate accepted first, of
+        # the SCREEN others of smallest projection error P, and of the WARM
+        # candidates
+        rank = np.argsort(P, kind='mergesort')
+        rank = rank[rank != first]
+        kept = np.in1d(nolist, self.WARM)
+        kept[first] = True
+        kept[rank[:self.SCREEN]] = True
+        self.positions = rank[~kept[rank]]
+        self.pruned = [nolist[i] for i in self.positions]
+        self.kept = np.count_nonzero(kept)
+        # the screening scores every candidate twice, for the first block
+        # and for what it leaves
+        self.work += 2*len(nolist)
+        return(np.flatnonzero(kept))
+
+    def readmit(self, stalled):
+        # Returns the next SCREEN pruned candidates, if the search stalls for
+        # the first time since the last re-admission or runs out of
+        # candidates
+        if not (self.READMIT and self.pruned) or (stalled and self.stalled):
+            return([])
+        self.stalled = stalled
+        batch = self.pruned[:self.SCREEN]
+        self.pruned = self.pruned[self.SCREEN:]
+        self.readmitted += len(batch)
+        return(batch)
+
+    def report(self):
+        if self.kept is None:
+            return
+        # Candidates scored without screening: N-i at iteration i
+        full = sum(self.N - i for i in xrange(self.iterations))
+        print('Screening: %i of %i candidates kept, %i re-admitted, %.0f%% of '
+              'the candidate evaluations saved' % (self.kept, self.N,
+              self.readmitted, 100*(1 - self.work/float(full))))
+
+
+if __name__ == "__main__":
+    import unittest
+    from basis_expansion import basis_expansion
+    from gram_statistics import GramStatistics
+    from simulate import simulate
+
+    def reference(Y, DX, M, th, D):
+        # The original loop of ARNI: pseudo-inverse of every possible
+        # composite space
+        N = Y.shape[2]//D
+        nolist = range(N)
+        llist = []
+        cost = []
+        vec = np.zeros(N,)
+        while nolist:
+            P = np.zeros(len(nolist))
+            cost_err = np.zeros(len(nolist))
+            for i, n in enumerate(nolist):
+                R = np.vstack([Y[:,:,D*m:D*(m+1)].transpose(2, 0, 1).reshape(-1, Y.shape[1])
+                               for m in llist + [n]])
+                DIFF = DX - np.dot(np.dot(DX, np.linalg.pinv(R)), R)
+                P[i] = np.std(DIFF)
+                cost_err[i] = (1/float(M)) * np.linalg.norm(DIFF)
+            if np.std(P) < th:
+                break
+            block = np.argmin(P)
+            llist.append(nolist[block])
+            vec[nolist[block]] = P[block]
+            cost.append(cost_err[block])
+            del nolist[block]
+        return(llist, cost, vec)
+
+    class TestGreedySearch(unittest.TestCase):
+        def system(self, D, noise):
+            # 8 candidate units of 3 basis functions per variable, the
+            # derivatives depending on units 5, 2 and 6
+            np.random.seed(1)
+            Y = np.random.randn(3, 120, 8*D)
+            DX = sum(np.dot(np.random.randn(3*D),
+                            Y[:,:,D*n:D*(n+1)].transpose(2, 0, 1).reshape(-1, 120))
+                     for n in (5, 2, 6))
+            return(Y, DX + noise*np.random.randn(120))
+
+        def compare(self, Y, DX, th, D):
+            llist, cost, vec = greedy_search(Y, DX, 12, th=th, D=D)
+            expected = reference(Y, DX, 12, th, D)
+            self.assertEqual(llist, expected[0])
+            np.testing.assert_almost_equal(cost, expected[1])
+            np.testing.assert_almost_equal(vec, expected[2])
+            return(llist)
+
+        def test_full_ranking(self):
+            # th=0 never stops the search: every unit is ranked
+            for D in (1, 3):
+                Y, DX = self.system(D, 0.1)
+                self.assertEqual(len(self.compare(Y, DX, 0, D)), 8)
+
+        def test_stopping(self):
+            # once the true inputs are accepted, every candidate fits the
+            # noiseless derivatives equally well and the search stops
+            for D in (1, 3):
+                Y, DX = self.system(D, 0)
+                self.assertEqual(sorted(self.compare(Y, DX, 0.0001, D)), [2, 5, 6])
+
+    class TestScreening(unittest.TestCase):
+        def test_true_inputs_kept(self):
+            # in-degree 3 plus the degradation of the unit itself, well
+            # below SCREEN; pruned candidates are not re-admitted, so that
+            # the true inputs must survive the screening
+            np.random.seed(0)
+            data = simulate('michaelis_menten', 20, 3, 60, 10, DIR=None)
+            X, DX = data.inputs()
+            adjacency = data.adjacency()
+            for n in xrange(20):
+                true = set(np.flatnonzero(adjacency[n,:])) | set([n])
+                Y = basis_expansion(X, 4, 'polynomial', n)
+                llist, _, _ = greedy_search(Y, DX[n,:], 10, SCREEN=10, READMIT=False)
+                self.assertEqual(set(llist[:len(true)]), true)
+                self.assertTrue(len(llist) <= 11)
+                stats = GramStatistics(Y.shape[0], 20).update(Y, DX[n,:])
+                llist, _, _ = greedy_search_gram(stats, 10, SCREEN=10, READMIT=False)
+                self.assertEqual(set(llist[:len(true)]), true)
+
+    unittest.main()
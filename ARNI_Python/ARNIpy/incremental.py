@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+import json
+import numpy as np
+import sys
+
+from basis_expansion import basis_expansion, basis_size
+from dataset import dimension
+from gram_statistics import GramStatistics, leading_centers
+from greedy_search import greedy_search_gram
+
+class IncrementalReconstruction(object):
+    '''
+     IncrementalReconstruction(MODEL,BASIS,ORDER,NODES,SCREEN,CENTERS,RANK,
+     DTYPE,CHUNK) reconstructs the incoming connections of a set of units
+     from time series that arrive over time, e.g. new recordings of an
+     experiment. It keeps the GramStatistics of every unit (see
+     gram_statistics) and its last inferred interactions, so that an update
+     only expands and accumulates the new time series, at a cost
+     proportional to their number, before repeating the greedy search on
+     the statistics of all time series seen, whose cost does not depend on
+     their length. The result equals that of reconstruct on all time series
+     with CHUNK set.
+
+     The search of an update is warm-started from the previous interactions
+     of the unit: with SCREEN, they are kept by the screening whatever
+     their marginal projection error (see greedy_search_gram), so that a
+     small SCREEN does not lose them.
+
+     Parameters
+     ------------------
+     MODEL:   Dynamic model employed. See reconstruct.
+     BASIS:   Type of basis employed. See reconstruct.
+     ORDER:   Number of basis in the expansion.
+     NODES:   Units upon the reconstruction takes place. Zero indexed. All
+              units of the first data set are reconstructed if None.
+     SCREEN:  Number of candidates searched. See reconstruct.
+     CENTERS: For RBF, selection of the centers. See reconstruct. The
+              centers are selected on the leading time series of the first
+              update (see leading_centers in gram_statistics) and kept for
+              all later ones.
+     RANK:    For RBF, number of Nystroem features. See reconstruct.
+     DTYPE:   Floating point type of the time derivatives and expansions.
+              See reconstruct.
+     CHUNK:   Number of time series expanded at a time.
+
+     Input type
+     ------------------
+     MODEL:   string
+     BASIS:   string
+     ORDER:   integer
+     NODES:   list of integers or None
+     SCREEN:  integer or None
+     CENTERS: string or None
+     RANK:    integer or None
+     DTYPE:   numpy dtype or None
+     CHUNK:   integer
+
+     Attributes
+     ------------------
+     stats:  Dictionary with the GramStatistics of every unit.
+     llists: Dictionary with the sequence of inferred interactions of every
+             unit.
+     costs:  Dictionary with the fitting costs of every unit.
+     scores: Matrix of size [N,N] whose row n contains the scores of the
+             inferred incoming connections of unit n, as returned by
+             reconstruct_network.
+     S:      Number of time series accumulated.
+
+     Example
+     ------------------
+     arni = IncrementalReconstruction('kuramoto2','fourier_diff',6);
+     arni.update(Dataset.load('Day1')); arni.save('arni.npz'), and later
+     changes = IncrementalReconstruction.load('arni.npz').update(
+     Dataset.load('Day2')) yields the links that entered or left the
+     reconstruction of every unit with the time series of the second day.
+
+     Accompanying material to "Model-free inference of direct interactions
+     from nonlinear collective dynamics".
+    '''
+    def __init__(self, MODEL, BASIS, ORDER, NODES=None, SCREEN=None,
+                 CENTERS=None, RANK=None, DTYPE=None, CHUNK=1):
+        models=['kuramoto1', 'kuramoto2', 'michaelis_menten', 'roessler']
+        bases=['polynomial', 'polynomial_diff', 'fourier', 'fourier_diff', 'power_series', 'RBF']
+
+        if (MODEL not in models):
+            sys.exit('ERROR: MODEL must be a valid string: kuramoto1')
+
+        elif (BASIS not in bases):
+            sys.exit('ERROR: BASIS must be a valid string: polynomial')
+
+        self.MODEL = MODEL
+        self.BASIS = BASIS
+        self.ORDER = ORDER
+        self.NODES = None if NODES is None else [int(n) for n in NODES]
+        self.SCREEN = SCREEN
+        self.CENTERS = CENTERS
+        self.RANK = RANK
+        self.DTYPE = None if DTYPE is None else np.dtype(DTYPE)
+        self.CHUNK = CHUNK
+        #Stopping criterium: decrease it to recover longer list of possible links
+        self.th = 0.0001
+        self.M = None
+        self.S = 0
+        self.stats = {}
+        self.centers = {}
+        self.llists = {}
+        self.costs = {}
+        self.scores = None
+
+    def update(self, DATA):
+        '''
+         update(DATA) adds the time series of the Dataset DATA to the
+         statistics of every unit and repeats its reconstruction. Returns a
+         dictionary with, for every unit, the pair (entered, left) of the
+         lists of links inferred now but not before, and before but not now.
+        '''
+        D = dimension(self.MODEL)
+        N = DATA.N // D
+        if self.NODES is None:
+            self.NODES = range(N)
+        if self.M is None:
+            self.M = DATA.M
+            self.scores = np.zeros((N, N))
+        elif self.scores.shape[0] != N:
+            raise ValueError('DATA must contain the units of the previous updates')
+        K = D*basis_size(self.ORDER, self.BASIS, self.RANK)
+
+        print('Accumulating the statistics of %i new time series...' % DATA.S)
+        groups = DATA.iter_inputs(self.MODEL, self.CHUNK, self.DTYPE)
+        for X, DX in groups:
+            for NODE in self.NODES:
+                ROW = D*NODE
+                if NODE not in self.stats:
+                    self.stats[NODE] = GramStatistics(K, N)
+                if self.BASIS == 'RBF' and NODE not in self.centers:
+                    self.centers[NODE] = leading_centers(DATA, self.MODEL, self.ORDER,
+                                                         ROW, self.CENTERS, self.CHUNK,
+                                                         self.DTYPE)
+                Y = basis_expansion(X, self.ORDER, self.BASIS, ROW,
+                                    CENTERS=self.centers.get(NODE), RANK=self.RANK)
+                self.stats[NODE].update(Y, DX[ROW,:])
+        self.S += DATA.S
+
+        print('Performing ARNI on %i units...' % len(self.NODES))
+        changes = {}
+        for NODE in self.NODES:
+            previous = self.llists.get(NODE, [])
+            llist, cost, vec = greedy_search_gram(self.stats[NODE], self.M,
+                                                  self.th, self.SCREEN,
+                                                  WARM=previous)
+            self.llists[NODE] = llist
+            self.costs[NODE] = cost
+            self.scores[NODE,:] = vec
+            changes[NODE] = ([n for n in llist if n not in previous],
+                             [n for n in previous if n not in llist])
+            if changes[NODE][0] or changes[NODE][1]:
+                print('Unit %i: links %s entered, %s left' % ((NODE,) + changes[NODE]))
+        print('Update has finished!')
+
+        return(changes)
+
+    def save(self, FILE):
+        '''
+         save(FILE) writes the statistics and the inferred interactions of
+         every unit to the npz file FILE, from which load resumes.
+        '''
+        header = {'MODEL': self.MODEL, 'BASIS': self.BASIS, 'ORDER': self.ORDER,
+                  'NODES': self.NODES, 'SCREEN': self.SCREEN,
+                  'CENTERS': self.CENTERS if self.CENTERS is None or
+                  isinstance(self.CENTERS, basestring) else None,
+                  'RANK': self.RANK, 'CHUNK': self.CHUNK, 'M': self.M, 'S': self.S,
+                  'DTYPE': None if self.DTYPE is None else self.DTYPE.str}
+        arrays = {'header': np.array(json.dumps(header)), 'scores': self.scores}
+        for NODE in self.stats:
+            for name in ('G', 'b', 'd', 'sY', 'sDX', 'L'):
+                arrays['%s_%i' % (name, NODE)] = getattr(self.stats[NODE], name)
+            arrays['llist_%i' % NODE] = np.array(self.llists[NODE], dtype=int)
+            arrays['cost_%i' % NODE] = np.array(self.costs[NODE], dtype=float)
+            if NODE in self.centers:
+                arrays['centers_%i' % NODE] = self.centers[NODE]
+        np.savez(FILE, **arrays)
+
+    @classmethod
+    def load(cls, FILE):
+        '''
+         IncrementalReconstruction.load(FILE) resumes the reconstruction
+         written by save.
+        '''
+        arrays = np.load(FILE)
+        header = json.loads(str(arrays['header']))
+        arni = cls(header['MODEL'], header['BASIS'], header['ORDER'],
+                   header['NODES'], header['SCREEN'], header['CENTERS'],
+                   header['RANK'], header['DTYPE'], header['CHUNK'])
+        arni.M = header['M']
+        arni.S = header['S']
+        arni.scores = arrays['scores']
+        for NODE in arni.NODES or []:
+            if 'G_%i' % NODE not in arrays.files:
+                continue
+            G = arrays['G_%i' % NODE]
+            N = arni.scores.shape[0]
+            stats = GramStatistics(G.shape[0] // N, N)
+            for name in ('G', 'b', 'd', 'sY', 'sDX', 'L'):
+                setattr(stats, name, arrays['%s_%i' % (name, NODE)])
+            stats.d, stats.sDX, stats.L = float(stats.d), float(stats.sDX), int(stats.L)
+            arni.stats[NODE] = stats
+            arni.llists[NODE] = arrays['llist_%i' % NODE].tolist()
+            arni.costs[NODE] = arrays['cost_%i' % NODE].tolist()
+            if 'centers_%i' % NODE in arrays.files:
+                arni.centers[NODE] = arrays['centers_%i' % NODE]
+        return(arni)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+import numpy as np
+
+def roc_curve(LABELS, SCORES):
+    '''
+     roc_curve(LABELS,SCORES) computes the receiver operating characteristic
+     of the SCORES of the possible connections of a unit, i.e. the rates of
+     true and false positives when all connections scoring at least a
+     threshold are taken as inferred, for every distinct score as threshold.
+     Points lying on a straight line between their neighbours are dropped.
+
+     Parameters
+     ------------------
+     LABELS: True connections, nonzero where a connection exists.
+     SCORES: Scores of the connections, larger for more likely connections.
+
+     Input type
+     ------------------
+     LABELS: vector of size [N]
+     SCORES: vector of size [N]
+
+     Output
+     ------------------
+     FPR:        False positives rate at every threshold, starting at 0.
+     TPR:        True positives rate at every threshold, starting at 0.
+     thresholds: Decreasing thresholds, the first one above all scores.
+
+     Example
+     ------------------
+     FPR, TPR, _ = roc_curve(adjacency[10,:],np.abs(vec)) evaluates the
+     scores of the incoming connections of unit 10 returned by greedy_search.
+    '''
+    LABELS = np.asarray(LABELS).ravel() != 0
+    SCORES = np.asarray(SCORES, dtype=float).ravel()
+
+    order = np.argsort(-SCORES, kind='mergesort')
+    SCORES = SCORES[order]
+    # last position of every distinct score
+    last = np.r_[np.flatnonzero(np.diff(SCORES)), SCORES.size-1]
+    tps = np.cumsum(LABELS[order])[last].astype(float)
+    fps = 1 + last - tps
+    thresholds = SCORES[last]
+
+    # keep the corners of the curve only
+    if tps.size > 2:
+        keep = np.r_[True, np.logical_or(np.diff(fps, 2), np.diff(tps, 2)), True]
+        tps, fps, thresholds = tps[keep], fps[keep], thresholds[keep]
+    if tps[0] != 0 or fps[0] != 0:
+        tps = np.r_[0, tps]
+        fps = np.r_[0, fps]
+        thresholds = np.r_[thresholds[0] + 1, thresholds]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return(fps/fps[-1], tps/tps[-1], thresholds)
+
+def auc(FPR, TPR):
+    '''
+     auc(FPR,TPR) is the area under the curve of points (FPR,TPR), by the
+     trapezoidal rule, e.g. of the receiver operating characteristic
+     returned by roc_curve.
+    '''
+    return(np.trapz(TPR, FPR))
+
+def roc_auc(LABELS, SCORES):
+    '''
+     roc_auc(LABELS,SCORES) computes the AUC scores of the receiver operating
+     characteristics of all rows of a score matrix in one call, sorting every
+     row once. The AUC of a row is the probability that a true connection
+     scores higher than a missing one, ties counting one half, which equals
+     the area under its curve as computed by roc_curve and auc.
+
+     Parameters
+     ------------------
+     LABELS: True connections, nonzero where a connection exists, e.g. the
+             connectivity matrix with the incoming connections of every unit
+             in its row.
+     SCORES: Scores of the connections, larger for more likely connections,
+             e.g. the absolute scores returned by reconstruct_network.
+
+     Input type
+     ------------------
+     LABELS: matrix of size [R,N] or vector of size [N]
+     SCORES: matrix of size [R,N] or vector of size [N]
+
+     Output
+     ------------------
+     AUC: AUC score of every row (a scalar for vectors), nan for rows
+          without true or without missing connections.
+
+     Example
+     ------------------
+     AUC = roc_auc(connectivity != 0,np.abs(scores)) evaluates the
+     reconstruction of all units of a network.
+    '''
+    LABELS = np.asarray(LABELS) != 0
+    SCORES = np.asarray(SCORES, dtype=float)
+    if LABELS.shape != SCORES.shape:
+        raise ValueError('LABELS and SCORES must have the same shape')
+    vector = SCORES.ndim == 1
+    LABELS = np.atleast_2d(LABELS)
+    SCORES = np.atleast_2d(SCORES)
+    R, N = SCORES.shape
+
+    order = np.argsort(SCORES, axis=1, kind='mergesort')
+    rows = np.arange(R)[:,None]
+    sorted_scores = SCORES[rows, order]
+
+    # first and last position of the group of equal scores of every entry,
+    # in the flattened matrix; rows start new groups
+    index = np.arange(R*N).reshape(R, N)
+    first = np.ones((R, N), dtype=bool)
+    first[:,1:] = sorted_scores[:,1:] != sorted_scores[:,:-1]
+    last = np.ones((R, N), dtype=bool)
+    last[:,:-1] = first[:,1:]
+    start = np.maximum.accumulate(np.where(first, index, 0).ravel())
+    end = np.minimum.accumulate(np.where(last, index, R*N).ravel()[::-1])[::-1]
+    # average rank, from 1, of every entry within its row
+    ranks = ((start + end)/2.).reshape(R, N) - N*rows + 1
+
+    positive = LABELS[rows, order]
+    P = np.count_nonzero(positive, axis=1).astype(float)
+    U = np.sum(ranks*positive, axis=1) - P*(P+1)/2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        AUC = np.where((P > 0) & (P < N), U/(P*(N-P)), np.nan)
+
+    if vector:
+        return(AUC[0])
+    return(AUC)
+
+
+if __name__ == "__main__":
+    import unittest
+    from numpy.testing import assert_almost_equal
+
+    class TestMetrics(unittest.TestCase):
+        def test_untied(self):
+            LABELS = [1, 0, 1, 0]
+            SCORES = [0.9, 0.8, 0.7, 0.1]
+            FPR, TPR, thresholds = roc_curve(LABELS, SCORES)
+            assert_almost_equal(FPR, [0., 0., 0.5, 0.5, 1.])
+            assert_almost_equal(TPR, [0., 0.5, 0.5, 1., 1.])
+            assert_almost_equal(thresholds, [1.9, 0.9, 0.8, 0.7, 0.1])
+            self.assertAlmostEqual(auc(FPR, TPR), 0.75)
+            self.assertAlmostEqual(roc_auc(LABELS, SCORES), 0.75)
+
+        def test_tied(self):
+            # the three scores of 0.5 are one threshold: a true connection
+            # ties with a missing one for one half
+            LABELS = [1, 1, 0, 0, 1]
+            SCORES = [0.5, 0.5, 0.5, 0.2, 0.1]
+            FPR, TPR, thresholds = roc_curve(LABELS, SCORES)
+            assert_almost_equal(FPR, [0., 0.5, 1., 1.])
+            assert_almost_equal(TPR, [0., 2/3., 2/3., 1.])
+            assert_almost_equal(thresholds, [1.5, 0.5, 0.2, 0.1])
+            self.assertAlmostEqual(auc(FPR, TPR), 0.5)
+            self.assertAlmostEqual(roc_auc(LABELS, SCORES), 0.5)
+
+        def test_degenerate(self):
+            SCORES = [0.3, 0.2, 0.2]
+            FPR, TPR, _ = roc_curve([1, 1, 1], SCORES)
+            self.assertTrue(np.all(np.isnan(FPR)))
+            assert_almost_equal(TPR, [0., 1/3., 1.])
+            self.assertTrue(np.isnan(roc_auc([1, 1, 1], SCORES)))
+            FPR, TPR, _ = roc_curve([0, 0, 0], SCORES)
+            assert_almost_equal(FPR, [0., 1/3., 1.])
+            self.assertTrue(np.all(np.isnan(TPR)))
+            self.assertTrue(np.isnan(roc_auc([0, 0, 0], SCORES)))
+
+        def test_rows(self):
+            AUC = roc_auc([[1, 0, 1, 0], [1, 1, 0, 0], [1, 1, 1, 1]],
+                          [[0.9, 0.8, 0.7, 0.1], [0.1, 0.2, 0.3, 0.4], [1., 2., 3., 4.]])
+            assert_almost_equal(AUC[:2], [0.75, 0.])
+            self.assertTrue(np.isnan(AUC[2]))
+
+    unittest.main()
@@ -1,79 +1,252 @@
 #!/usr/bin/env python
 import numpy as np
-from scipy.integrate import odeint
-import matplotlib.pyplot as plt
+from scipy import sparse
+
+def _coupling(J):
+    # Coupling matrices are kept dense, or sparse in CSR format
+    if sparse.issparse(J):
+        return(sparse.csr_matrix(J, dtype=float))
+    return(np.asarray(J, dtype=float))
+
+def _edges(J):
+    # Edge list (i, j, J_ij) of a sparse coupling matrix, None if dense
+    if sparse.issparse(J):
+        E = J.tocoo()
+        return(E.row, E.col, E.data)
+    return(None)
+
+def _dot(J, y):
+    # J applied to the last axis of y, for single or stacked states
+    return(J.dot(y.T).T)
+
+def _phase_jacobian(J, edges, y, shift):
+    # Jacobian of sum_j J_ij*sin(y_j-y_i-shift): J_ij*cos(y_j-y_i-shift) off
+    # the diagonal, minus the row sums on it
+    if edges is not None:
+        i, j, Jij = edges
+        A = sparse.csr_matrix((Jij*np.cos(y[j]-y[i]-shift), (i, j)), shape=J.shape)
+        return(A - sparse.diags(np.asarray(A.sum(axis=1)).ravel()))
+    A = J*np.cos(y[None,:]-y[:,None]-shift)
+    A[np.diag_indices_from(A)] -= A.sum(axis=1)
+    return(A)
+
+def _scatter(i, values, N):
+    # Sums values[..., e] into the target units i[e] along the last axis
+    if values.ndim == 1:
+        return(np.bincount(i, values, minlength=N))
+    S = values.shape[0]
+    idx = (N*np.arange(S)[:,None] + i[None,:]).ravel()
+    return(np.bincount(idx, values.ravel(), minlength=S*N).reshape(S, N))
+
+class Kuramoto1(object):
+    '''
+     Kuramoto1(J,w) defines a network of phase oscillators coupled through
+     dy_i/dt = w_i + sum_j J_ij*sin(y_j-y_i). Instances are called as
+     model(y,t), as required by odeint, where y may also stack several
+     states along its first dimension. model.jacobian(y,t) returns the
+     Jacobian of a single state, sparse (CSR) if J is sparse.
+
+     Input type
+     ------------------
+     J: Weighted adjacency matrix of size [N,N], dense or scipy.sparse.
+     w: Intrinsic frequencies of size [N].
+    '''
+    def __init__(self, J, w):
+        self.J = _coupling(J)
+        self.w = np.asarray(w, dtype=float)
+        self.edges = _edges(self.J)
+
+    def __call__(self, y, t):
+        if self.edges is not None:
+            # gather the phase differences over the edges, scatter to targets
+            i, j, Jij = self.edges
+            return(self.w + _scatter(i, Jij*np.sin(y[...,j]-y[...,i]),
+                                     y.shape[-1]))
+        s = np.sin(y)
+        c = np.cos(y)
+        # sum_j J_ij*sin(y_j-y_i) by angle addition
+        return(self.w + c*_dot(self.J, s) - s*_dot(self.J, c))
+
+    def jacobian(self, y, t):
+        return(_phase_jacobian(self.J, self.edges, y, 0.))
+
+class Kuramoto2(object):
+    '''
+     Kuramoto2(J,w) defines a network of phase oscillators coupled through
+     dy_i/dt = w_i + sum_j J_ij*sin(y_j-y_i-1.05) + 0.33*sin(2*(y_i-y_j)).
+     Instances are called as model(y,t), as required by odeint, where y may
+     also stack several states along its first dimension.
+     model.jacobian(y,t) returns the Jacobian of a single state, which is
+     dense since the second harmonic couples all pairs.
+
+     Input type
+     ------------------
+     J: Weighted adjacency matrix of size [N,N], dense or scipy.sparse.
+     w: Intrinsic frequencies of size [N].
+    '''
+    def __init__(self, J, w):
+        self.J = _coupling(J)
+        self.w = np.asarray(w, dtype=float)
+        self.edges = _edges(self.J)
+
+    def __call__(self, y, t):
+        # the second harmonic acts between all pairs of oscillators
+        s2 = np.sin(2*y)
+        c2 = np.cos(2*y)
+        dydt = self.w + 0.33*(s2*np.sum(c2, axis=-1, keepdims=True)
+                              - c2*np.sum(s2, axis=-1, keepdims=True))
+
+        if self.edges is not None:
+            # gather the phase differences over the edges, scatter to targets
+            i, j, Jij = self.edges
+            return(dydt + _scatter(i, Jij*np.sin(y[...,j]-y[...,i]-1.05),
+                                   y.shape[-1]))
+        s = np.sin(y)
+        c = np.cos(y)
+        Js = _dot(self.J, s)
+        Jc = _dot(self.J, c)
+        # sin(y_j-y_i) and cos(y_j-y_i) weighted by J_ij
+        Jsin = c*Js - s*Jc
+        Jcos = c*Jc + s*Js
+        return(dydt + np.cos(1.05)*Jsin - np.sin(1.05)*Jcos)
+
+    def jacobian(self, y, t):
+        # second harmonic: d/dy_j 0.33*sin(2*(y_i-y_j)) = -0.66*cos(2*(y_i-y_j)),
+        # with cos(2*(y_i-y_j)) = c2_i*c2_j + s2_i*s2_j
+        s2 = np.sin(2*y)
+        c2 = np.cos(2*y)
+        A = -0.66*(np.outer(c2, c2) + np.outer(s2, s2))
+        A[np.diag_indices_from(A)] -= A.sum(axis=1)
+        coupling = _phase_jacobian(self.J, self.edges, y, 1.05)
+        if sparse.issparse(coupling):
+            return(coupling.toarray() + A)
+        return(coupling + A)
+
+class MichaelisMenten(object):
+    '''
+     MichaelisMenten(J) defines a network of units coupled through
+     dy_i/dt = -y_i + sum_j J_ij*y_j/(1+y_j). Instances are called as
+     model(y,t), as required by odeint, where y may also stack several
+     states along its first dimension. model.jacobian(y,t) returns the
+     Jacobian of a single state, sparse (CSR) if J is sparse.
+
+     Input type
+     ------------------
+     J: Weighted adjacency matrix of size [N,N], dense or scipy.sparse.
+    '''
+    def __init__(self, J):
+        self.J = _coupling(J)
+
+    def __call__(self, y, t):
+        return(-y + _dot(self.J, y/(1+y)))
+
+    def jacobian(self, y, t):
+        # J_ij/(1+y_j)^2, minus the identity
+        d = 1/(1+y)**2
+        if sparse.issparse(self.J):
+            A = sparse.csr_matrix(self.J.multiply(d[None,:]))
+            return(A - sparse.identity(len(y), format='csr'))
+        A = self.J*d[None,:]
+        A[np.diag_indices_from(A)] -= 1
+        return(A)
+
+class Roessler(object):
+    '''
+     Roessler(J) defines a network of Roessler oscillators coupled through
+     their x variables, dx_i/dt = -y_i - z_i + sum_j J_ij*sin(x_j). The state
+     vector is ordered as (x_0,y_0,z_0,x_1,...). Instances are called as
+     model(y,t), as required by odeint, where y may also stack several
+     states along its first dimension. model.jacobian(y,t) returns the
+     Jacobian of a single state, sparse (CSR) if J is sparse.
+
+     Input type
+     ------------------
+     J: Weighted adjacency matrix of size [N,N], dense or scipy.sparse.
+    '''
+    def __init__(self, J):
+        self.J = _coupling(J)
+
+    def __call__(self, y, t):
+        x1 = y[...,0::3]
+        x2 = y[...,1::3]
+        x3 = y[...,2::3]
+        dydt = np.empty(y.shape)
+        dydt[...,0::3] = -x2 - x3 + _dot(self.J, np.sin(x1))
+        dydt[...,1::3] = x1 + 0.1*x2
+        dydt[...,2::3] = 0.1 + x3*(x1-18)
+        return(dydt)
+
+    def jacobian(self, y, t):
+        N = self.J.shape[0]
+        x1 = y[0::3]
+        x3 = y[2::3]
+        u = 3*np.arange(N)
+        # within every oscillator: dx/d(y,z), dy/d(x,y), dz/d(x,z)
+        i = np.concatenate((u, u, u+1, u+1, u+2, u+2))
+        j = np.concatenate((u+1, u+2, u, u+1, u, u+2))
+        v = np.concatenate((-np.ones(N), -np.ones(N), np.ones(N), 0.1*np.ones(N),
+                            x3, x1-18))
+        # coupling of the x variables: J_ij*cos(x_j)
+        E = sparse.coo_matrix(self.J)
+        i = np.concatenate((i, 3*E.row))
+        j = np.concatenate((j, 3*E.col))
+        v = np.concatenate((v, E.data*np.cos(x1[E.col])))
+        A = sparse.csr_matrix((v, (i, j)), shape=(3*N, 3*N))
+        if sparse.issparse(self.J):
+            return(A)
+        return(A.toarray())
+
+class Ensemble(object):
+    '''
+     Ensemble(model,S) integrates S independent copies of a model as a
+     single state vector of S stacked states, evaluating the right-hand side
+     of all copies in one vectorized call. The Jacobian of the stacked
+     system is block diagonal, so that odeint should be called with
+     ml=mu=n-1, n being the size of a single state, and
+     ensemble.jacobian(y,t) returns it in sparse (CSR) format.
+
+     Input type
+     ------------------
+     model: Model object, e.g. Kuramoto1.
+     S:     integer
+    '''
+    def __init__(self, model, S):
+        self.model = model
+        self.S = S
+
+    def __call__(self, y, t):
+        return(self.model(y.reshape(self.S, -1), t).ravel())
+
+    def jacobian(self, y, t):
+        return(sparse.block_diag([self.model.jacobian(ys, t) for ys in
+                                  y.reshape(self.S, -1)], format='csr'))
 
 def kuramoto1(y,t):
-    dydt = np.zeros((y.shape[0],))
-
     w = np.loadtxt('Data/frequencies.dat')
-
-    k = w.shape[0]
-
     J = np.loadtxt('Data/connectivity.dat')
-
-    for i in xrange(k):
-        sum = 0.0
-        for j in xrange(k):
-            sum += J[i,j] * np.sin(y[j] - y[i])
-
-        dydt[i] = w[i] + sum
-
-    return(dydt)
+    return(Kuramoto1(J, w)(y, t))
 
 def kuramoto2(y,t):
-    dydt = np.zeros((y.shape[0],))
-
     w = np.loadtxt('Data/frequencies.dat')
-
-    k = w.shape[0]
-
     J = np.loadtxt('Data/connectivity.dat')
-
-    for i in xrange(k):
-        sum=0.0
-        for j in xrange(k):
-            sum += J[i,j]*(np.sin(y[j]-y[i]-1.05)) + 0.33*np.sin(2*(y[i]-y[j]))
-        dydt[i] = w[i] + sum
-
-    return(dydt)
+    return(Kuramoto2(J, w)(y, t))
 
 def michaelis_menten(y,t):
-    dydt = np.zeros((y.shape[0],))
-
     J = np.loadtxt('Data/connectivity.dat')
-
-    k = J.shape[0]
-
-    for i in xrange(k):
-        sum=0.0
-        for j in xrange(k):
-            sum += (J[i,j] * (y[j]/(1+y[j])))
-        dydt[i] = -y[i] + sum
-
-    return(dydt)
+    return(MichaelisMenten(J)(y, t))
 
 def roessler(y,t):
-    dydt = np.zeros(y.shape[0])
-
     J = np.loadtxt('Data/connectivity.dat')
-    N = J.shape[0]
-
-    for i in xrange(N):
-        sum = 0.0
-        for j in xrange(N):
-            sum += J[i,j]*np.sin(y[(3*j)+0])
-
-        dydt[(3*i)+0] = -y[(3*i)+1] - y[(3*i)+2] + sum
-        dydt[(3*i)+1] = y[(3*i)+0] + 0.1*y[(3*i)+1]
-        dydt[(3*i)+2] = 0.1 + (y[(3*i)+2]*(y[(3*i)+0]-18))
-
-    return(dydt)
+    return(Roessler(J)(y, t))
 
 if __name__ == "__main__":
+    from scipy.integrate import odeint
+    import matplotlib.pyplot as plt
+
     init = 1. + np.random.uniform(0.,1.,size=(6,))
     tspan = np.arange(0,10,1)
-    y = odeint(roessler, init, tspan)
+    J = np.array([[0., 0.5], [0.5, 0.]])
+    y = odeint(Roessler(J), init, tspan)
 
     plt.plot(tspan,y)
     plt.savefig("test.pdf")
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+import json
+import logging
+import os
+import resource
+import time
+
+def rss():
+    '''
+     rss() returns the resident set size of this process in bytes, or None
+     if it cannot be read from /proc.
+    '''
+    return(_status('VmRSS'))
+
+def peak():
+    '''
+     peak() returns the peak resident set size of this process in bytes,
+     since it started or since the last reset_peak().
+    '''
+    value = _status('VmHWM')
+    if value is None:
+        value = 1024*resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return(value)
+
+def reset_peak():
+    '''
+     reset_peak() resets the peak resident set size of this process, if the
+     kernel allows it, and returns the current resident set size in bytes,
+     or None if the peak cannot be reset.
+    '''
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except (IOError, OSError):
+        return(None)
+    return(rss())
+
+def _status(key):
+    # Reads a memory figure of this process from /proc, in bytes
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(key):
+                    return(1024*int(line.split()[1]))
+    except (IOError, OSError):
+        return(None)
+
+def _cpu():
+    t = os.times()
+    return(t[0] + t[1])
+
+class Profile(object):
+    '''
+     Profile(SINK,MEMORY) records the wall time, CPU time and peak memory of
+     the phases of a reconstruction: data loading, derivative estimation,
+     basis expansion, the pre-screening and every iteration of the greedy
+     search (with its number of candidates) and evaluation.
+
+     Every phase yields a record, i.e. a dictionary with the name of the
+     phase, its wall and CPU times in seconds, the increase of the resident
+     set size over the phase in bytes (peak_bytes, None if MEMORY is False
+     or unavailable), further information of the phase and the entries of
+     context. Records are kept in records and passed to SINK, if given, as
+     they are produced.
+
+     Parameters
+     ------------------
+     SINK:   Callable receiving every record, e.g. a JSONLines or a
+             LoggerSink.
+     MEMORY: Whether to measure the peak memory of every phase. This relies
+             on resetting the peak resident set size of the process through
+             /proc/self/clear_refs.
+
+     Input type
+     ------------------
+     SINK:   callable or None
+     MEMORY: boolean
+
+     Example
+     ------------------
+     profile = Profile(JSONLines('profile.jsonl'))
+     reconstruct('kuramoto2',10,'fourier_diff',6,PROFILE=profile)
+     profile.summary() shows whether the time went into reading the data,
+     the expansion or the greedy search.
+    '''
+    def __init__(self, SINK=None, MEMORY=True):
+        self.SINK = SINK
+        self.MEMORY = MEMORY and reset_peak() is not None
+        self.records = []
+        self.context = {}
+
+    def phase(self, name, **info):
+        '''
+         phase(name,**info) returns a context manager measuring the code it
+         encloses as the phase name.
+        '''
+        return(_Phase(self, name, info))
+
+    def add(self, record):
+        record.update(self.context)
+        self.records.append(record)
+        if self.SINK is not None:
+            self.SINK(record)
+
+    def summary(self):
+        '''
+         summary() returns a dictionary with, for every phase, the number of
+         records and their total wall and CPU times and largest peak memory.
+        '''
+        phases = {}
+        for record in self.records:
+            s = phases.setdefault(record['phase'],
+                                  {'count': 0, 'wall': 0., 'cpu': 0., 'peak_bytes': None})
+            s['count'] += 1
+            s['wall'] += record['wall']
+            s['cpu'] += record['cpu']
+            if record['peak_bytes'] is not None:
+                s['peak_bytes'] = max(s['peak_bytes'], record['peak_bytes'])
+        return(phases)
+
+class _Phase(object):
+    def __init__(self, profile, name, info):
+        self.profile = profile
+        self.name = name
+        self.info = info
+
+    def __enter__(self):
+        self.rss = reset_peak() if self.profile.MEMORY else None
+        self.cpu = _cpu()
+        self.wall = time.time()
+        return(self)
+
+    def __exit__(self, *exc):
+        wall = time.time() - self.wall
+        cpu = _cpu() - self.cpu
+        record = dict(self.info, phase=self.name, wall=wall, cpu=cpu,
+                      peak_bytes=peak() - self.rss if self.rss is not None else None)
+        self.profile.add(record)
+        return(False)
+
+class _NoProfile(object):
+    # Stands for a disabled profile: phases are not measured at all
+    def phase(self, name, **info):
+        return(_NO_PHASE)
+
+class _NoPhase(object):
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, *exc):
+        return(False)
+
+NO_PROFILE = _NoProfile()
+_NO_PHASE = _NoPhase()
+
+class JSONLines(object):
+    '''
+     JSONLines(FILE) is a sink writing every record as a line of JSON to
+     FILE, either a file name (appended to) or an open file.
+    '''
+    def __init__(self, FILE):
+        self.file = open(FILE, 'a') if isinstance(FILE, basestring) else FILE
+
+    def __call__(self, record):
+        self.file.write(json.dumps(record, sort_keys=True) + '\n')
+        self.file.flush()
+
+class LoggerSink(object):
+    '''
+     LoggerSink(logger,level) is a sink passing every record to a logger of
+     the logging module.
+    '''
+    def __init__(self, logger, level=logging.INFO):
+        self.logger = logger
+        self.level = level
+
+    def __call__(self, record):
+        self.logger.log(self.level, '%s', json.dumps(record, sort_keys=True))
@@ -1,27 +1,70 @@
 #!/usr/bin/env python
-from math import pi
 import numpy as np
-from sklearn.metrics import roc_curve, auc
 import sys
 
 from basis_expansion import basis_expansion
-
-def reconstruct(MODEL, NODE, BASIS, ORDER):
+from dataset import Dataset, dimension
+from evaluation import ground_truth
+from gram_statistics import sketch_statistics, stream_statistics
+from greedy_search import greedy_search, greedy_search_gram
+from metrics import roc_curve, auc
+from profiling import NO_PROFILE
+
+def reconstruct(MODEL, NODE, BASIS, ORDER, DATA=None, CACHE=None, CHUNK=None,
+                SCREEN=None, PROFILE=None, CENTERS=None, RANK=None, DTYPE=None,
+                SKETCH=None, SEED=None):
     '''
-    reconstruct(MODEL, NODE, BASIS, ORDER) returns a ranked list of the inferred
-    incoming connections
+    reconstruct(MODEL, NODE, BASIS, ORDER, DATA, CACHE, CHUNK, SCREEN, PROFILE,
+    CENTERS, RANK, DTYPE, SKETCH, SEED) returns a ranked list of the inferred incoming connections
 
      Parameters
      ------------------
      MODEL: Dynamic model employed. This is only used to specify whether the
             time series come from 1D systems like kuramoto1 or 3D systems like
             roessler. Thus, it is not used during the actual reconstruction.
+            The state variables of the units of multi-dimensional systems
+            (see dimension in dataset) are searched as one candidate each.
      NODE:  Unit upon the reconstruction takes place. Zero indexed
      BASIS: Type of basis employed. Currently, polynomial, polynomial_diff,
             power_series, fourier, fourier_diff and RBF are supported. For
             more detailed information, please see 'Functions/basis_expansion.m'
             and Table I in the main manuscript.
      ORDER: Number of basis in the expansion.
+     DATA:  Dataset to reconstruct from, e.g. as returned by simulate. The
+            data set in 'Data/' is read if None.
+     CACHE: ExpansionCache from which basis expansions are reused.
+     CHUNK: If given, the data set is streamed in groups of CHUNK time series
+            and the greedy search runs on the accumulated Gram statistics of
+            the expansion (see gram_statistics), so that memory does not
+            depend on the length of the recordings.
+     SCREEN: If given, only the SCREEN candidates that best explain, on their
+            own, the time derivatives are searched, scored at once before
+            the first iteration (see greedy_search), which pays off for
+            networks of many units. SCREEN must comfortably exceed the
+            in-degree of the unit, e.g. several times it, and more so for
+            short or few time series: true inputs that score poorly on their
+            own are pruned, and re-admission does not reliably recover them.
+     PROFILE: Profile in which the wall time, CPU time and peak memory of
+            every phase of the reconstruction are recorded (see profiling).
+            Nothing is measured if None.
+     CENTERS: For RBF, selection of the centers: first, random, kmeans++ or
+            grid (see rbf_centers in basis_expansion). The first ORDER time
+            points are used if None.
+     RANK:  For RBF, number of Nystroem features approximating the ORDER
+            radial basis functions, which speeds up the search when many
+            centers are requested. All are used if None.
+     DTYPE: Floating point type of the time derivatives, the expansion and
+            the greedy search, e.g. float32 to halve memory and speed up the
+            search on large networks. Gram statistics are accumulated in
+            float64 regardless. The type of the data set is kept if None.
+     SKETCH: If given, the time points of the expansion and of the time
+            derivatives are projected onto SKETCH random combinations of
+            them (see sketch_statistics in gram_statistics), streaming the
+            data set in groups of CHUNK time series (one if None), and the
+            greedy search runs on the sketch. For recordings of millions of
+            time points, a sketch of a few thousands approximates the
+            ranking at a fraction of the cost of the Gram matrix.
+     SEED:  Seed of the random generator drawing the sketch.
 
      Input type
      ------------------
@@ -29,10 +72,21 @@ def reconstruct(MODEL, NODE, BASIS, ORDER):
      NODE:  integer
      BASIS: string
      ORDER: integer
+     DATA:  Dataset or None
+     CACHE: ExpansionCache or None
+     CHUNK: integer or None
+     SCREEN: integer or None
+     PROFILE: Profile or None
+     CENTERS: string or None
+     RANK:  integer or None
+     DTYPE: numpy dtype or None
+     SKETCH: integer or None
+     SEED:  integer or None
 
      Output
      ------------------
-     list: Sequence of inferred interactions in the order such were detected.
+     list: Sequence of inferred interactions (units) in the order such were
+           detected.
      cost: Fitting cost for all inferred interactions in the order such were
            detected.
      FPR:  False positives rate for the reconstruction.
@@ -65,198 +119,67 @@ def reconstruct(MODEL, NODE, BASIS, ORDER):
 
     else:
         print('Initiating reconstruction...')
-        print('Reading data...')
-        data = np.loadtxt('Data/data.dat', delimiter='\t')
-        connectivity = np.loadtxt('Data/connectivity.dat', delimiter='\t')
-        ts_param=np.loadtxt('Data/ts_param.dat', delimiter='\t')
-        data=data.transpose()
-
-        S = int(ts_param[0])
-        M = int(ts_param[1])
-        N = int(data.shape[0])
-
-        x = data
+        if PROFILE is None:
+            PROFILE = NO_PROFILE
+        if DATA is None:
+            print('Reading data...')
+            with PROFILE.phase('load'):
+                DATA = Dataset.load()
+        connectivity = DATA.adjacency()
+        M = DATA.M
 
         # Estimating time derivatives and constructing input matrices
         print('Estimating time derivatives and constructing input matrices...')
-        Xtemp = np.array([])
-        DX = np.array([])
-        for s in xrange(S):
-            m_start = M*s
-            m_end = M*s + (M-1)
-            x0 = x[:,m_start:m_end]
-            x1 = x[:,m_start+1:m_end+1]
-
-            Ytemp = (x0 + x1) * 0.5
-            DY = x1 - x0
-
-            Xtemp = np.hstack((Xtemp, Ytemp)) if Xtemp.size else Ytemp
-            DX = np.hstack((DX, DY)) if DX.size else DY
-
-        if MODEL == 'roessler':
-            # Construction of connectivity matrix for Roessler oscillators
-            # including y and z variables
-            Ns = int(np.ceil(N/3.))
-            connectivity2 = np.zeros((Ns,N))
-
-            # for each node, x1 regulated by x2 & x3. Modify adjacency matrix
-            # for comparison to predictions
-            for i in xrange(Ns):
-                for j in xrange(Ns):
-                    connectivity2[i,(3*j)+0] = connectivity[i,j]
-                    if i == j:
-                        connectivity2[i,(3*j)+1] = 1
-                        connectivity2[i, (3*j)+2] = 1
-
-            X = Xtemp
-
-            #beginning of reconstruction algorithm
-            print('Performing ARNI...')
-            Y = basis_expansion(X, ORDER, BASIS, NODE)
-            nolist = range(N)
-            llist = []
-            cost = []
-            b = 1
-            vec = np.zeros(N,)
-            while (nolist and (b==1)):
-                #composition of inferred subspaces
-                Z = np.array([])
-                for n in xrange(len(llist)):
-                    Z = np.vstack((Z, Y[:,:,llist[n]])) if Z.size else Y[:,:,llist[n]]
-
-                # Projection on remaining composite subspaces
-                P = np.zeros((len(nolist), 2))
-                cost_err = np.zeros(len(nolist),)
-                for n in xrange(len(nolist)):
-                    #composition of a possible space
-                    R = np.vstack((Z, Y[:,:,nolist[n]])) if Z.size else Y[:,:,nolist[n]]
-                    #Error of projection on possible composite space
-                    #  ( A.R=DX )
-                    RI = np.linalg.pinv(R)
-                    A = np.dot(DX[(3*NODE),:], RI)
-                    DX_est = np.dot(A, R)
-                    DIFF = DX[(3*NODE),:] - DX_est
-                    P[n,0] = np.std(DIFF)
-                    P[n,1] = int(nolist[n])
-                    # Fitting cost of possible composite
-                    cost_err[n] = (1/float(M)) * np.linalg.norm(DIFF)
-                    R = np.array([])
-
-                if np.std(P[:,0]) < th:
-                    b = 0
-                    break
-
-                else:
-                    # Selection of composite space which minimizes projection error
-                    MIN = np.min(P[:,0]) #best score
-                    block = np.argmin(P[:,0]) #node index of best
-                    llist.append(int(P[block,1])) # add best node ID to llist
-                    nolist.remove(int(P[block,1])) # remove best from candidate list
-                    vec[int(P[block,1])] = MIN # used in ROC curve
-                    cost.append(cost_err[block]) # record SS error
-
-            # end of reconstruction algorithm
+        # Units of several state variables are searched as one block each,
+        # fitting the time derivatives of their first variable
+        D = dimension(MODEL)
+        ROW = D*NODE
+        if CHUNK is None and SKETCH is None:
+            with PROFILE.phase('derivatives'):
+                X, DX = DATA.inputs(MODEL, DTYPE)
+        if CACHE is None:
+            expand = lambda X, K, TYPE, NODE: basis_expansion(X, K, TYPE, NODE,
+                                                              CENTERS=CENTERS, RANK=RANK)
+        else:
+            KEY = DATA.fingerprint(MODEL, DTYPE)
+            expand = lambda X, K, TYPE, NODE: CACHE.basis_expansion(X, K, TYPE, NODE, KEY,
+                                                                    CENTERS, RANK)
+
+        #beginning of reconstruction algorithm
+        print('Performing ARNI...')
+        if SKETCH is not None:
+            stats = sketch_statistics(DATA, MODEL, NODE, BASIS, ORDER, SKETCH,
+                                      SEED, CHUNK or 1, PROFILE, CENTERS, RANK,
+                                      DTYPE)
+            llist, cost, vec = greedy_search_gram(stats, M, th, SCREEN, PROFILE=PROFILE)
+        elif CHUNK is not None:
+            stats = stream_statistics(DATA, MODEL, NODE, BASIS, ORDER, CHUNK,
+                                      PROFILE, CENTERS, RANK, DTYPE)
+            llist, cost, vec = greedy_search_gram(stats, M, th, SCREEN, PROFILE=PROFILE)
+        else:
+            with PROFILE.phase('expansion'):
+                Y = expand(X, ORDER, BASIS, ROW)
+            llist, cost, vec = greedy_search(Y, DX[ROW,:], M, th, SCREEN,
+                                             PROFILE=PROFILE, D=D)
+        print('Reconstruction has finished!')
+
+        # end of reconstruction algorithm
+        with PROFILE.phase('evaluation'):
             if not llist:
                 print('WARNING: no predicted regulators - check that NODE abundance varies in the data!')
                 AUC = np.nan
                 FPR = [np.nan]
                 TPR = [np.nan]
 
-            #evaluation of results via AUC score
-            else:
-                #load connectivity for comparison
-                adjacency = connectivity2
-                adjacency[adjacency != 0] = 1
-
-                print('Quality of reconstruction:')
-
-                if (np.sum(adjacency[NODE,:]) == 0):
-                    print('WARNING: no true positive regulators!')
-                    AUC = np.nan
-                    FPR = [np.nan]
-                    TPR = [np.nan]
-                else:
-                    # Evaluation of results via AUC score
-                    FPR, TPR, _ = roc_curve(np.abs(adjacency[NODE,:]), np.abs(vec), 1)
-                    AUC = auc(FPR, TPR)
-
-                    FPR = np.insert(FPR,0,0.)
-                    TPR = np.insert(TPR,0,0.)
-
-                print(AUC)
-
-
-
-        else: #if not Roessler
-            if MODEL in ('kuramoto1', 'kuramoto2'):
-                #Transforming data coming from phase oscillators
-                X = np.mod(Xtemp, 2*pi)
-            else:
-                X = Xtemp
-
-            # Beginning of reconstruction algorithm
-            print('Performing ARNI...')
-            # Y[basis, sample, node]
-            Y = basis_expansion(X, ORDER, BASIS, NODE)
-            nolist = range(N)
-            llist = []
-            cost = []
-            b=1
-            vec = np.zeros(N,)
-            while (nolist and (b==1)):
-                #composition of inferred subspaces
-                Z = np.array([])
-                for n in xrange(len(llist)):
-                    Z = np.vstack((Z,Y[:,:,llist[n]])) if Z.size else Y[:,:,llist[n]]
-
-                # projection on remaining composite spaces
-                P = np.zeros((len(nolist),2))
-                cost_err = np.zeros(len(nolist),)
-                for n in xrange(len(nolist)):
-                    #composition of a possible spaces
-                    R = np.vstack((Z, Y[:,:,nolist[n]])) if Z.size else Y[:,:,nolist[n]]
-                    #error of projection on possible composite space
-                    # ( A.R=DX)
-                    RI = np.linalg.pinv(R)
-                    A = np.dot(DX[NODE,:], RI)
-                    DX_est = np.dot(A, R)
-                    DIFF = DX[NODE,:] - DX_est
-                    P[n,0] = np.std(DIFF) # the uniformity of error
-                    P[n,1] = int(nolist[n])
-                    #Fitting cost of possible composite space
-                    cost_err[n] =  (1/float(M)) * np.linalg.norm(DIFF)
-                    R = np.array([])
-
-                # break if all candidates equivalent
-                if np.std(P[:,0]) < th:
-                    b=0
-                    break
-
-                else:
-                    #Selection of composite space which minimises projection error
-                    MIN = np.min(P[:,0]) #best score
-                    block = np.argmin(P[:,0]) #node index of best
-                    llist.append(int(P[block,1])) # add best node ID to llist
-                    nolist.remove(int(P[block,1])) # remove best from candidate list
-                    vec[int(P[block,1])] = MIN # used in ROC curve
-                    cost.append(cost_err[block]) # record SS Error
-            print('Reconstruction has finished!')
-
-            if not llist:
-                print('WARNING: no predicted regulators - check that NODE abundance varies in the data!')
+            elif connectivity is None:
+                print('WARNING: no connectivity to evaluate the reconstruction!')
                 AUC = np.nan
                 FPR = [np.nan]
                 TPR = [np.nan]
 
             else:
                 #load connectivity for comparison
-                adjacency = connectivity
-                adjacency[adjacency != 0] = 1
-
-                #adding degradation rate to true adjecency matric of Michaelis-menten systems
-                if MODEL == 'michaelis_menten':
-                    for i in xrange(N):
-                        adjacency[i,i] = 1
+                adjacency = ground_truth(MODEL, connectivity)
 
                 print('Quality of reconstruction:')
 
@@ -267,8 +190,7 @@ def reconstruct(MODEL, NODE, BASIS, ORDER):
                     TPR = [np.nan]
                 else:
                     # Evaluation of results via AUC score
-                    FPR, TPR, _ = roc_curve(np.abs(adjacency[NODE,:]),
-                    np.abs(vec), 1)
+                    FPR, TPR, _ = roc_curve(adjacency[NODE,:], np.abs(vec))
                     AUC = auc(FPR, TPR)
                     FPR = np.insert(FPR,0,0.)
                     TPR = np.insert(TPR,0,0.)
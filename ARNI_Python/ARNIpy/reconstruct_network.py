@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+import multiprocessing
+import numpy as np
+import sys
+
+from basis_expansion import basis_expansion
+from dataset import Dataset, dimension
+from expansion_cache import ExpansionCache
+from greedy_search import greedy_search
+
+# Input matrices shared with the worker processes
+_shared = {}
+
+def _share(A):
+    # Copies A into an unlocked block of shared memory of its own type
+    raw = multiprocessing.RawArray(A.dtype.char, A.size)
+    np.frombuffer(raw, A.dtype).reshape(A.shape)[...] = A
+    return(raw, A.shape, A.dtype)
+
+def _view(shared):
+    # Array on a block of shared memory returned by _share
+    raw, shape, dtype = shared
+    return(np.frombuffer(raw, dtype).reshape(shape))
+
+def _budget(CACHE, PROCESSES):
+    # Memory budget of the cache of every worker, CACHE being shared by the
+    # PROCESSES workers (as many as CPUs if None)
+    if not CACHE:
+        return(None)
+    return(CACHE // (PROCESSES or multiprocessing.cpu_count()))
+
+def _init_worker(X, DX, M, CACHE):
+    _shared['X'] = _view(X)
+    _shared['DX'] = _view(DX)
+    _shared['M'] = M
+    _shared['cache'] = ExpansionCache(CACHE) if CACHE else None
+
+def _reconstruct_node(args):
+    NODE, D, BASIS, ORDER, SCREEN, CENTERS, RANK = args
+    ROW = D*NODE
+    if _shared['cache'] is None:
+        Y = basis_expansion(_shared['X'], ORDER, BASIS, ROW, CENTERS=CENTERS, RANK=RANK)
+    else:
+        Y = _shared['cache'].basis_expansion(_shared['X'], ORDER, BASIS, ROW, 'X',
+                                             CENTERS, RANK)
+    return(greedy_search(Y, _shared['DX'][ROW,:], _shared['M'], SCREEN=SCREEN, D=D))
+
+def reconstruct_network(MODEL, BASIS, ORDER, NODES=None, PROCESSES=None,
+                        DATA=None, CACHE=2**30, SCREEN=None, CENTERS=None,
+                        RANK=None, DTYPE=None):
+    '''
+     reconstruct_network(MODEL,BASIS,ORDER,NODES,PROCESSES,DATA,CACHE,SCREEN,
+     CENTERS,RANK,DTYPE) infers the incoming connections of several units in one
+     job, distributing the units over a pool of worker processes.
+
+     The time series are read and their time derivatives are estimated only
+     once. The resulting input matrices are placed in shared memory, so that
+     the workers access them without copies.
+
+     Parameters
+     ------------------
+     MODEL:     Dynamic model employed. See reconstruct.
+     BASIS:     Type of basis employed. See reconstruct.
+     ORDER:     Number of basis in the expansion.
+     NODES:     Units upon the reconstruction takes place. Zero indexed. All
+                units are reconstructed if None.
+     PROCESSES: Number of worker processes. The number of CPUs is used if
+                None, and the reconstruction runs in the calling process if
+                1.
+     DATA:      Dataset to reconstruct from. The data set in 'Data/' is read
+                if None.
+     CACHE:     Memory budget in bytes of the expansion caches, shared
+                equally by the workers: every worker keeps an ExpansionCache
+                of CACHE // PROCESSES bytes, which lets bases that do not
+                depend on the unit (polynomial, fourier) be expanded only
+                once per worker. No cache is kept if None.
+     SCREEN:    Number of candidates searched. See reconstruct.
+     CENTERS:   For RBF, selection of the centers. See reconstruct.
+     RANK:      For RBF, number of Nystroem features. See reconstruct.
+     DTYPE:     Floating point type of the shared input matrices, the
+                expansions and the searches, e.g. float32. See reconstruct.
+
+     Input type
+     ------------------
+     MODEL:     string
+     BASIS:     string
+     ORDER:     integer
+     NODES:     list of integers or None
+     PROCESSES: integer or None
+     DATA:      Dataset or None
+     CACHE:     integer or None
+     SCREEN:    integer or None
+     CENTERS:   string or None
+     RANK:      integer or None
+     DTYPE:     numpy dtype or None
+
+     Output
+     ------------------
+     scores: Matrix of size [N,N] whose row n contains the scores of the
+             inferred incoming connections of unit n, as used in ROC curves
+             by reconstruct. Rows of units not reconstructed are zero.
+     llists: Dictionary with the sequence of inferred interactions of every
+             reconstructed unit.
+     costs:  Dictionary with the fitting costs of every reconstructed unit.
+
+     Example
+     ------------------
+     reconstruct_network('michaelis_menten','polynomial',6,PROCESSES=4)
+     reconstructs the connectivity of all units using four processes.
+
+     Accompanying material to "Model-free inference of direct interactions
+     from nonlinear collective dynamics".
+    '''
+
+    models=['kuramoto1', 'kuramoto2', 'michaelis_menten', 'roessler']
+    bases=['polynomial', 'polynomial_diff', 'fourier', 'fourier_diff', 'power_series', 'RBF']
+
+    if (MODEL not in models):
+        sys.exit('ERROR: MODEL must be a valid string: kuramoto1')
+
+    elif (BASIS not in bases):
+        sys.exit('ERROR: BASIS must be a valid string: polynomial')
+
+    print('Initiating network reconstruction...')
+    if DATA is None:
+        print('Reading data...')
+        DATA = Dataset.load()
+    M = DATA.M
+
+    print('Estimating time derivatives and constructing input matrices...')
+    X, DX = DATA.inputs(MODEL, DTYPE)
+
+    # units of several state variables are searched as one block each
+    D = dimension(MODEL)
+    N = X.shape[0] // D
+    if NODES is None:
+        NODES = range(N)
+
+    tasks = [(NODE, D, BASIS, ORDER, SCREEN, CENTERS, RANK) for NODE in NODES]
+
+    print('Performing ARNI on %i units...' % len(tasks))
+    if PROCESSES == 1:
+        _shared.update(X=X, DX=DX, M=M)
+        _shared['cache'] = ExpansionCache(CACHE) if CACHE else None
+        try:
+            results = map(_reconstruct_node, tasks)
+        finally:
+            # a failed run must not leave its data to the next one
+            _shared.clear()
+    else:
+        pool = multiprocessing.Pool(PROCESSES, _init_worker,
+                                    (_share(X), _share(DX), M,
+                                     _budget(CACHE, PROCESSES)))
+        try:
+            results = pool.map(_reconstruct_node, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    scores = np.zeros((N, N))
+    llists = {}
+    costs = {}
+    for NODE, (llist, cost, vec) in zip(NODES, results):
+        scores[NODE,:] = vec
+        llists[NODE] = llist
+        costs[NODE] = cost
+    print('Network reconstruction has finished!')
+
+    return(scores, llists, costs)
+
+if __name__ == '__main__':
+    scores, llists, costs = reconstruct_network('kuramoto2', 'fourier_diff', 6)
+    print(llists)
@@ -1,16 +1,59 @@
 #!/usr/bin/env python
+import multiprocessing
 import numpy as np
-from scipy.integrate import odeint
-import subprocess
+import os
+from scipy import sparse
+from scipy.integrate import odeint, solve_ivp
 import sys
 
-from models import kuramoto1,kuramoto2, michaelis_menten, roessler
+from datafile import FILES, _remove
+from dataset import Dataset
+from models import Kuramoto1, Kuramoto2, MichaelisMenten, Roessler, Ensemble
 from topology import topology
 
-def simulate(MODEL, N, NI, S, M):
+# Model integrated by the worker processes
+_ensemble = {}
+
+# Methods of solve_ivp employing the Jacobian of the model, and whether it
+# has to be dense
+JACOBIAN = {'BDF': False, 'Radau': False, 'LSODA': True}
+
+def _solve(model, init, tspan, SOLVER, **kwargs):
+    # Integrates model from init, returning the states at the times tspan
+    if SOLVER == 'odeint':
+        return(odeint(model, init, tspan, **kwargs))
+    if SOLVER in JACOBIAN:
+        if JACOBIAN[SOLVER]:
+            kwargs['jac'] = lambda t, y: _dense(model.jacobian(y, t))
+        else:
+            kwargs['jac'] = lambda t, y: model.jacobian(y, t)
+    # tolerances of odeint
+    sol = solve_ivp(lambda t, y: model(y, t), (tspan[0], tspan[-1]), init,
+                    method=SOLVER, t_eval=tspan, rtol=1.49012e-8,
+                    atol=1.49012e-8, **kwargs)
+    if not sol.success:
+        raise RuntimeError('solve_ivp failed: %s' % sol.message)
+    return(sol.y.T)
+
+def _dense(A):
+    return(A.toarray() if sparse.issparse(A) else A)
+
+def _init_worker(model, tspan, SOLVER):
+    _ensemble['model'] = model
+    _ensemble['tspan'] = tspan
+    _ensemble['SOLVER'] = SOLVER
+
+def _integrate(init):
+    return(_solve(_ensemble['model'], init, _ensemble['tspan'], _ensemble['SOLVER']))
+
+def simulate(MODEL, N, NI, S, M, SPARSE=False, ENSEMBLE='serial',
+             PROCESSES=None, FORMAT='npy', DIR='Data', TOPOLOGY='homogeneous',
+             SOLVER='odeint'):
     '''
-     simulate(MODEL,N,NI,S,M) generates time series of networks of dynamical
-     systems for several different intial conditions.
+     simulate(MODEL,N,NI,S,M,SPARSE,ENSEMBLE,PROCESSES,FORMAT,DIR,TOPOLOGY,
+     SOLVER) generates
+     time series of networks of dynamical systems for several different
+     intial conditions.
 
      Parameters
      ------------------
@@ -22,6 +65,27 @@ def simulate(MODEL, N, NI, S, M):
      NI:    Number of incoming connections per unit.
      S:     Number of different time series.
      M:     Number of time points per time series.
+     SPARSE: Whether to keep the connectivity in scipy.sparse format, so that
+            the coupling is only evaluated over existing connections. Use it
+            for large networks.
+     ENSEMBLE: How the S time series are integrated: serial (one after the
+            other), stacked (all together as a single stacked state vector)
+            or pool (distributed over a pool of worker processes).
+     PROCESSES: Number of worker processes for ENSEMBLE='pool'. The number
+            of CPUs is used if None.
+     FORMAT: File format of the data set: npy (binary, memory-mappable) or
+            dat (tab-separated text, as read by the MATLAB code).
+     DIR:   Directory in which the data set is written, replacing the files
+            of any previous data set in it; other files are left untouched.
+            Nothing is written if None.
+     TOPOLOGY: Type of the directed network: homogeneous, regular,
+            scale_free or small_world (see topology).
+     SOLVER: Integrator: odeint, or a method of scipy.integrate.solve_ivp
+            (e.g. RK45, LSODA, BDF or Radau) evaluated at the sampling times.
+            BDF, Radau and LSODA are given the analytic Jacobian of the
+            model, which is sparse for SPARSE (except for kuramoto2), instead
+            of estimating it by finite differences. Use BDF or Radau with
+            SPARSE for stiff dynamics of large networks.
 
      Input type
      ------------------
@@ -30,13 +94,26 @@ def simulate(MODEL, N, NI, S, M):
      NI:    integer (NI<N)
      S:     integer
      M:     integer
+     SPARSE: boolean
+     ENSEMBLE: string
+     PROCESSES: integer or None
+     FORMAT: string
+     DIR:   string or None
+     TOPOLOGY: string
+     SOLVER: string
 
      Output
      ------------------
-     'Data/data.dat':     File containing all simulated time series in a
+     Dataset holding the time series, the connectivity and, for phase
+     oscillators, the intrinsic frequencies. Unless DIR is None, it is also
+     written to disk:
+     'Data/data.npy':     File containing all simulated time series in a
                           concatenaded form.
-     'Data/ts_param.dat': File containing time series parameters, i.e. S and
-                          M, for later extracting the different time series.
+     'Data/dataset.json': File containing time series parameters, i.e. S and
+                          M, for later extracting the different time series,
+                          as well as N, the dtype and the model.
+     For FORMAT dat, the time series are written to 'Data/data.dat' and their
+     parameters to 'Data/ts_param.dat' instead.
 
      Example
      ------------------
@@ -55,58 +132,80 @@ def simulate(MODEL, N, NI, S, M):
     resolution=1
 
     models={'kuramoto1', 'kuramoto2', 'michaelis_menten', 'roessler'}
+    ensembles={'serial', 'stacked', 'pool'}
+    formats={'npy', 'dat'}
+    solvers={'odeint', 'RK23', 'RK45', 'LSODA', 'BDF', 'Radau'}
     if (MODEL not in models):
         sys.exit('ERROR: MODEL must be a valid string:kuramoto1, kuramoto2, michaelis_menten, roessler')
+    elif (ENSEMBLE not in ensembles):
+        sys.exit('ERROR: ENSEMBLE must be a valid string: serial, stacked, pool')
+    elif (FORMAT not in formats):
+        sys.exit('ERROR: FORMAT must be a valid string: npy, dat')
+    elif (SOLVER not in solvers):
+        sys.exit('ERROR: SOLVER must be a valid string: odeint, RK45, LSODA, BDF, Radau')
     else:
-        cmd='rm -r Data/'
-        process = subprocess.Popen(cmd.split())
-        process.wait()
-
-        cmd='mkdir Data/'
-        process = subprocess.Popen(cmd.split())
-        process.wait()
-
         print('Creating network structure...')
-        topology(N, 'homogeneous', 'directed', NI) #
+        J = topology(N, TOPOLOGY, 'directed', NI, SPARSE, DIR=None) #
+        w = None
         print('Simulating time series...')
-        Y = np.array([])
+        # initial conditions of all S time series are drawn before the
+        # integration, so that results do not depend on ENSEMBLE
         if MODEL == 'kuramoto1':
             w = -2 + 4*np.random.uniform(low=0., high=1., size=(N,))
-            np.savetxt('Data/frequencies.dat', w, fmt='%.4f',delimiter='\t')
-            for s in xrange(S):
-                init = -3.14 + (3.14+3.14) * np.random.uniform(0.,1.,size=(N,))
-                tspan = np.arange(0,M,resolution)
-                y = odeint(kuramoto1, init, tspan)
-                Y = np.vstack((Y,y)) if Y.size else y
+            model = Kuramoto1(J, w)
+            init = -3.14 + (3.14+3.14) * np.random.uniform(0.,1.,size=(S,N))
 
         elif MODEL == 'kuramoto2':
             w = -2 + (4) * np.random.uniform(0.,1.,size=(N,))
-            np.savetxt('Data/frequencies.dat',w, fmt='%.4f', delimiter='\t')
-            for s in xrange(S):
-                init = -3.14 + (3.14+3.14)*np.random.uniform(0.,1.,size=(N,))
-                tspan=np.arange(0,M,resolution)
-                y = odeint(kuramoto2, init, tspan)
-                Y = np.vstack((Y,y)) if Y.size else y
+            model = Kuramoto2(J, w)
+            init = -3.14 + (3.14+3.14)*np.random.uniform(0.,1.,size=(S,N))
 
         elif MODEL == 'michaelis_menten':
-            for s in xrange(S):
-                init = 1+np.random.uniform(0.,1.,size=(N,))
-                tspan=np.arange(0,M,resolution)
-                y = odeint(michaelis_menten, init, tspan)
-                Y = np.vstack((Y,y)) if Y.size else y
+            model = MichaelisMenten(J)
+            init = 1+np.random.uniform(0.,1.,size=(S,N))
 
         elif MODEL == 'roessler':
+            model = Roessler(J)
+            init=-5 + (5+5)*np.random.uniform(0.,1., size=(S,3*N))
+
+        tspan = np.arange(0,M,resolution)
+        T = tspan.shape[0]
+        n = init.shape[1]
+        # Y[time series*time point, unit]
+        Y = np.empty((S*T, n))
+
+        if ENSEMBLE == 'stacked':
+            if SOLVER == 'odeint':
+                y = _solve(Ensemble(model, S), init.ravel(), tspan, SOLVER,
+                           ml=n-1, mu=n-1)
+            else:
+                y = _solve(Ensemble(model, S), init.ravel(), tspan, SOLVER)
+            Y[:,:] = y.reshape(T, S, n).transpose(1, 0, 2).reshape(S*T, n)
+
+        elif ENSEMBLE == 'pool':
+            pool = multiprocessing.Pool(PROCESSES, _init_worker, (model, tspan, SOLVER))
+            try:
+                for s, y in enumerate(pool.imap(_integrate, init)):
+                    Y[s*T:(s+1)*T,:] = y
+            finally:
+                pool.close()
+                pool.join()
+
+        else:
             for s in xrange(S):
-                init=-5 + (5+5)*np.random.uniform(0.,1., size=(3*N,))
-                tspan = np.arange(0,M,resolution)
-                y = odeint(roessler, init, tspan)
-                Y = np.vstack((Y,y)) if Y.size else y
+                Y[s*T:(s+1)*T,:] = _solve(model, init[s], tspan, SOLVER)
 
-        ts_param=[S,M]
-        np.savetxt('Data/data.dat', Y, fmt='%.4f', delimiter='\t')
-        np.savetxt('Data/ts_param.dat', ts_param, fmt='%i',delimiter='\t')
+        data = Dataset(Y.T, S, T, MODEL, J, w)
+        if DIR is not None:
+            # the files of a previous data set, e.g. its frequencies, are
+            # removed, and nothing else in DIR
+            if os.path.isdir(DIR):
+                _remove(DIR, *FILES)
+            data.save(DIR, FORMAT)
 
         print('Simulation finished!')
 
+        return(data)
+
 if __name__ =='__main__':
     simulate('michaelis_menten', 5, 2, 3, 10)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+import csv
+from itertools import imap
+import multiprocessing
+import numpy as np
+import sys
+import time
+
+from basis_expansion import basis_expansion, basis_size
+from dataset import Dataset, dimension
+from evaluation import ground_truth
+from expansion_cache import ExpansionCache
+from greedy_search import greedy_search
+from metrics import roc_auc
+from reconstruct_network import _budget, _init_worker, _share, _shared
+
+def _rows(BASIS, ORDER, KMAX, CENTERS=None, RANK=None):
+    # Rows of the expansion of order KMAX making up the expansion of order
+    # ORDER, or None if the latter is not contained in the former
+    if BASIS in ('polynomial', 'polynomial_diff', 'fourier', 'fourier_diff'):
+        return(slice(0, basis_size(ORDER, BASIS)))
+    elif BASIS == 'power_series':
+        k = np.arange(ORDER+1)
+        return(((KMAX+1)*k[:,None] + k[None,:]).ravel())
+    elif BASIS == 'RBF' and RANK is None and (CENTERS is None or (
+            isinstance(CENTERS, basestring) and CENTERS == 'first')):
+        # the centers are the first time points
+        return(slice(0, ORDER))
+    return(None)
+
+def _cell(args):
+    # Reconstructs one cell of the sweep in a worker, expanding the basis at
+    # the largest order of the sweep if the cell's expansion is contained in
+    # it and the worker's cache can keep it for the smaller orders, and at
+    # the cell's order otherwise
+    BASIS, ORDER, KMAX, NODE, D, th, SCREEN, CENTERS, RANK = args
+    ROW = D*NODE
+    X = _shared['X']
+    cache = _shared['cache']
+    rows = _rows(BASIS, ORDER, KMAX, CENTERS, RANK)
+    if cache is None or basis_size(KMAX, BASIS, RANK)*X.nbytes > cache.MAXBYTES:
+        rows = None
+    K = ORDER if rows is None else KMAX
+    wall = time.time()
+    if cache is None:
+        Y = basis_expansion(X, K, BASIS, ROW, CENTERS=CENTERS, RANK=RANK)
+    else:
+        Y = cache.basis_expansion(X, K, BASIS, ROW, 'X', CENTERS, RANK)
+    expansion = time.time() - wall
+    if rows is not None:
+        Y = Y[rows]
+    wall = time.time()
+    llist, cost, vec = greedy_search(Y, _shared['DX'][ROW,:], _shared['M'], th,
+                                     SCREEN, D=D)
+    return({'BASIS': BASIS, 'ORDER': ORDER, 'NODE': NODE, 'llist': llist,
+            'cost': cost, 'vec': vec, 'expansion': expansion,
+            'search': time.time() - wall})
+
+def sweep(MODEL, BASES, ORDERS, NODES=None, PROCESSES=None, DATA=None,
+          CACHE=2**30, SCREEN=None, CENTERS=None, RANK=None, DTYPE=None):
+    '''
+     sweep(MODEL,BASES,ORDERS,NODES,PROCESSES,DATA,CACHE,SCREEN,CENTERS,RANK,
+     DTYPE) reconstructs the incoming connections of every unit in NODES with
+     every basis in BASES and every order in ORDERS, e.g. to select the basis
+     and order best suited to a data set, and yields the result of every
+     cell of the grid as soon as it is completed.
+
+     The work shared by the cells is done once: the data set is read and its
+     time derivatives are estimated once, and placed in shared memory for a
+     pool of worker processes. The cells of a unit and a basis are handed to
+     the same worker, which expands the basis once at the largest order of
+     ORDERS, keeps it in its cache and searches the expansions of smaller
+     orders on its rows (except for RBF with other centers than the first
+     time points or with RANK, whose expansions are not nested). Without a
+     cache, or if the expansion at the largest order does not fit in it,
+     every cell expands the basis at its own order. Bases that do not depend
+     on the unit are expanded once per worker.
+
+     The arguments are checked when sweep is called; the data set is read
+     and the cells are reconstructed as the generator is consumed.
+
+     Parameters
+     ------------------
+     MODEL:     Dynamic model employed. See reconstruct.
+     BASES:     Types of basis employed. See reconstruct.
+     ORDERS:    Numbers of basis in the expansion.
+     NODES:     Units upon the reconstruction takes place. Zero indexed. All
+                units are reconstructed if None.
+     PROCESSES: Number of worker processes. The number of CPUs is used if
+                None, and the cells run in the calling process if 1.
+     DATA:      Dataset to reconstruct from. The data set in 'Data/' is read
+                if None.
+     CACHE:     Memory budget in bytes of the expansion caches, shared
+                equally by the workers. See reconstruct_network.
+     SCREEN:    Number of candidates searched. See reconstruct.
+     CENTERS:   For RBF, selection of the centers. See reconstruct.
+     RANK:      For RBF, number of Nystroem features. See reconstruct.
+     DTYPE:     Floating point type of the input matrices, the expansions and
+                the searches. See reconstruct.
+
+     Input type
+     ------------------
+     MODEL:     string
+     BASES:     list of strings
+     ORDERS:    list of integers
+     NODES:     list of integers or None
+     PROCESSES: integer or None
+     DATA:      Dataset or None
+     CACHE:     integer or None
+     SCREEN:    integer or None
+     CENTERS:   string or None
+     RANK:      integer or None
+     DTYPE:     numpy dtype or None
+
+     Output
+     ------------------
+     Generator of dictionaries, one per cell in the order of completion,
+     with entries BASIS, ORDER and NODE, the inferred interactions (llist),
+     their fitting costs (cost) and scores (vec) as returned by
+     greedy_search, the AUC score (nan if the connectivity is not known or
+     the unit has no true regulators), and the wall times in seconds spent
+     expanding (expansion, close to zero when the expansion is reused) and
+     searching (search). See tabulate.
+
+     Example
+     ------------------
+     rows = tabulate(sweep('kuramoto2',['fourier','fourier_diff'],[2,4,6]),
+     'sweep.csv') compares two bases and three orders on all units.
+
+     Accompanying material to "Model-free inference of direct interactions
+     from nonlinear collective dynamics".
+    '''
+
+    models=['kuramoto1', 'kuramoto2', 'michaelis_menten', 'roessler']
+    bases=['polynomial', 'polynomial_diff', 'fourier', 'fourier_diff', 'power_series', 'RBF']
+
+    if (MODEL not in models):
+        sys.exit('ERROR: MODEL must be a valid string: kuramoto1')
+
+    elif any(BASIS not in bases for BASIS in BASES):
+        sys.exit('ERROR: BASIS must be a valid string: polynomial')
+
+    elif not ORDERS:
+        raise ValueError('ORDERS must contain at least one order')
+
+    return(_sweep(MODEL, BASES, ORDERS, NODES, PROCESSES, DATA, CACHE, SCREEN,
+                  CENTERS, RANK, DTYPE))
+
+def _sweep(MODEL, BASES, ORDERS, NODES, PROCESSES, DATA, CACHE, SCREEN,
+           CENTERS, RANK, DTYPE):
+    # Generator of the cells of sweep, once its arguments are checked
+
+    #Stopping criterium: decrease it to recover longer list of possible links
+    th=0.0001
+
+    if DATA is None:
+        print('Reading data...')
+        DATA = Dataset.load()
+    M = DATA.M
+    connectivity = DATA.adjacency()
+    adjacency = None if connectivity is None else ground_truth(MODEL, connectivity)
+
+    print('Estimating time derivatives and constructing input matrices...')
+    X, DX = DATA.inputs(MODEL, DTYPE)
+    D = dimension(MODEL)
+    if NODES is None:
+        NODES = range(X.shape[0] // D)
+
+    # The cells of a unit and a basis are consecutive, from the largest
+    # order on, and are handed to a worker in one chunk
+    KMAX = max(ORDERS)
+    ORDERS = sorted(ORDERS, reverse=True)
+    tasks = [(BASIS, ORDER, KMAX, NODE, D, th, SCREEN, CENTERS, RANK)
+             for BASIS in BASES for NODE in NODES for ORDER in ORDERS]
+
+    print('Sweeping %i cells...' % len(tasks))
+    if PROCESSES == 1:
+        _shared.update(X=X, DX=DX, M=M)
+        _shared['cache'] = ExpansionCache(CACHE) if CACHE else None
+        pool = None
+        cells = imap(_cell, tasks)
+    else:
+        pool = multiprocessing.Pool(PROCESSES, _init_worker,
+                                    (_share(X), _share(DX), M,
+                                     _budget(CACHE, PROCESSES)))
+        cells = pool.imap_unordered(_cell, tasks, chunksize=len(ORDERS))
+    try:
+        for row in cells:
+            row['AUC'] = _auc(adjacency, row['NODE'], row['vec'])
+            yield row
+    finally:
+        if pool is None:
+            _shared.clear()
+        else:
+            pool.terminate()
+            pool.join()
+
+def _auc(adjacency, NODE, vec):
+    # AUC score of the scores of unit NODE, as in reconstruct
+    if adjacency is None or np.sum(adjacency[NODE,:]) == 0 or not np.any(vec):
+        return(np.nan)
+    return(roc_auc(adjacency[NODE,:], np.abs(vec)))
+
+def tabulate(rows, FILE=None):
+    '''
+     tabulate(rows,FILE) collects the rows yielded by sweep, as they are
+     completed, into a list sorted by basis, order and unit, and writes them
+     to the CSV file FILE if given, with one line per cell and the columns
+     BASIS, ORDER, NODE, AUC, expansion, search, llist and cost (lists
+     separated by spaces).
+    '''
+    rows = sorted(rows, key=lambda row: (row['BASIS'], row['ORDER'], row['NODE']))
+    if FILE is not None:
+        with open(FILE, 'wb') as f:
+            writer = csv.writer(f)
+            writer.writerow(['BASIS', 'ORDER', 'NODE', 'AUC', 'expansion',
+                             'search', 'llist', 'cost'])
+            for row in rows:
+                writer.writerow([row['BASIS'], row['ORDER'], row['NODE'],
+                                 row['AUC'], row['expansion'], row['search'],
+                                 ' '.join(map(str, row['llist'])),
+                                 ' '.join(map(repr, row['cost']))])
+    return(rows)
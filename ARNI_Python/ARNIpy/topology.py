@@ -1,85 +1,187 @@
 #!/usr/bin/env python
 import numpy as np
+from scipy import sparse
 import sys
 
-def topology(N,TYPE, DIRECTED, NI):
+from datafile import save_connectivity
+
+def _distinct(cols, free, draw):
+    # Redraws the free entries of cols, of size [N,NI], until no unit is
+    # connected to itself or twice to the same unit. Of two equal entries,
+    # a free one is redrawn.
+    N = cols.shape[0]
+    units = np.arange(N)[:,None]
+    while True:
+        order = np.lexsort((free, cols))
+        sorted_cols = cols[units, order]
+        repeated = np.zeros(cols.shape, dtype=bool)
+        repeated[units, order[:,1:]] = sorted_cols[:,1:] == sorted_cols[:,:-1]
+        bad = (repeated | (cols == units)) & free
+        n = np.count_nonzero(bad)
+        if n == 0:
+            return(cols)
+        cols[bad] = draw(n)
+
+def edges(N, TYPE, DIRECTED, NI, REWIRE=0.1, EXPONENT=3.):
     '''
-     topology(N,TYPE,DIRECTED,NI) generates connectivity matrices for network
-     simulation.
+     edges(N,TYPE,DIRECTED,NI,REWIRE,EXPONENT) generates the connections of
+     a network as arrays of edges, at a cost proportional to their number,
+     so that networks of millions of units can be built. topology returns
+     them as a matrix.
 
      Parameters
      ------------------
      N:        Network size.
-     TYPE:     Type of network. Currently, only homogeneous (random network
-               with fixed number of incoming connections) and regular are
-               supported.
+     TYPE:     Type of network: homogeneous (NI incoming connections from
+               units drawn at random), regular (NI incoming connections at
+               the same, randomly drawn offsets for all units), scale_free
+               (NI incoming connections from units drawn with probability
+               proportional to a weight n^(-1/(EXPONENT-1)) of unit n, so
+               that outgoing degrees follow a power law of exponent
+               EXPONENT) or small_world (ring lattice of NI incoming
+               connections from the nearest units, each rewired to a unit
+               drawn at random with probability REWIRE).
      DIRECTED: Network (un)directionality, i.e. directed or undirected.
+               Undirected networks add the reverse of every connection.
      NI:       Number of incoming connections per unit.
+     REWIRE:   Rewiring probability of small_world networks.
+     EXPONENT: Exponent of the degree distribution of scale_free networks.
 
      Input type
      ------------------
      N:        integer
      TYPE:     string
      DIRECTED: string
-     NI:       integer
+     NI:       integer (NI<N)
+     REWIRE:   double
+     EXPONENT: double (EXPONENT>2)
 
      Output
      ------------------
-     'Data/connectivity.dat': File containing a weighted adjacency matrix.
+     rows: Units receiving every connection.
+     cols: Units sending every connection.
+     vals: Weight of every connection, uniform in [0.5,1]/NI.
 
      Example
      ------------------
-     topology(20,'homogeneous','undirected',5) generates an undirected
-     connectivity matrix of 20x20, where each unit has 5 randomly-selected
-     incoming connections.
-
-     Author: Jose Casadiego
-     Date:   May 2017
+     edges(10**5,'homogeneous','directed',10) generates the connections of
+     a random network of 100000 units with 10 incoming connections each.
     '''
 
-    types={'homogeneous', 'regular'}
+    types={'homogeneous', 'regular', 'scale_free', 'small_world'}
     directness={'directed', 'undirected'}
     if (TYPE not in types):
-        sys.exit('ERROR: TYPE must be a valid string: homogeneous, regular')
+        sys.exit('ERROR: TYPE must be a valid string: homogeneous, regular, scale_free, small_world')
     elif (DIRECTED not in directness):
         sys.exit('ERROR: DIRECTED must be a valid string: directed, undirected')
-    else:
-            J = np.zeros((N,N)) # coupling matrices
+    if not 0 < NI < N:
+        raise ValueError('NI must be between 1 and N-1')
+
+    if TYPE == 'homogeneous': #homogeneous topology with NI connection per unit
+        if 2*NI > N:
+            # many connections per unit: NI smallest of N-1 random keys
+            keys = np.random.uniform(0, 1, size=(N, N))
+            np.fill_diagonal(keys, 2.)
+            cols = np.argsort(keys, axis=1)[:,:NI]
+        else:
+            draw = lambda n: np.random.randint(0, N, size=n)
+            cols = _distinct(draw(N*NI).reshape(N, NI), np.ones((N, NI), dtype=bool), draw)
+
+    elif TYPE == 'regular': #regular structure with NI connections per unit
+        f = np.random.permutation(range(1,N))
+        cols = (np.arange(N)[:,None] + f[:NI]) % N
+
+    elif TYPE == 'scale_free': #static scale-free network with NI connection per unit
+        w = np.cumsum(np.arange(1, N+1) ** (-1/(EXPONENT-1.)))
+        draw = lambda n: np.searchsorted(w, w[-1]*np.random.uniform(0, 1, size=n), 'right')
+        # hubs at random positions
+        units = np.random.permutation(N)
+        draw_unit = lambda n: units[np.minimum(draw(n), N-1)]
+        cols = _distinct(draw_unit(N*NI).reshape(N, NI), np.ones((N, NI), dtype=bool),
+                         draw_unit)
+
+    elif TYPE == 'small_world': #Watts-Strogatz network with NI connection per unit
+        # nearest units on either side: offsets 1, -1, 2, -2, ...
+        k = np.arange(NI)
+        offsets = (k//2 + 1) * np.where(k % 2 == 0, 1, -1)
+        cols = (np.arange(N)[:,None] + offsets) % N
+        free = np.random.uniform(0, 1, size=(N, NI)) < REWIRE
+        cols[free] = np.random.randint(0, N, size=np.count_nonzero(free))
+        cols = _distinct(cols, free, lambda n: np.random.randint(0, N, size=n))
+
+    rows = np.repeat(np.arange(N), NI)
+    cols = cols.ravel()
+    vals = (0.5+(1-0.5)*np.random.uniform(0,1,size=N*NI))/NI
+
+    if DIRECTED == 'undirected':
+        # J_ji takes the value of J_ij wherever only the latter exists
+        reverse = ~np.in1d(cols*N + rows, rows*N + cols)
+        rows, cols, vals = (np.concatenate((rows, cols[reverse])),
+                            np.concatenate((cols, rows[reverse])),
+                            np.concatenate((vals, vals[reverse])))
+
+    return(rows, cols, vals)
+
+def topology(N, TYPE, DIRECTED, NI, SPARSE=False, FORMAT='npy', DIR='Data',
+             REWIRE=0.1, EXPONENT=3.):
+    '''
+     topology(N,TYPE,DIRECTED,NI,SPARSE,FORMAT,DIR,REWIRE,EXPONENT) generates
+     connectivity matrices for network simulation.
 
-            if TYPE == 'homogeneous': #homogeneous topology with NI connection per unit
-                for i in xrange(N):
-                    f = np.random.permutation(range(N))
-                    f = [x for x in f if x != i]
-                    for j in xrange(NI):
-                        J[i,f[j]]=(0.5+(1-0.5)*np.random.uniform(0,1))/NI
+     Parameters
+     ------------------
+     N:        Network size.
+     TYPE:     Type of network: homogeneous (random network with fixed
+               number of incoming connections), regular, scale_free or
+               small_world. See edges.
+     DIRECTED: Network (un)directionality, i.e. directed or undirected.
+     NI:       Number of incoming connections per unit.
+     SPARSE:   Whether to build the matrix in scipy.sparse CSR format, without
+               ever allocating a dense N x N matrix.
+     FORMAT:   File format of the matrix: npy (binary) or dat (text).
+     DIR:      Directory in which the matrix is written. Nothing is written
+               if None, and the matrix is only returned.
+     REWIRE:   Rewiring probability of small_world networks.
+     EXPONENT: Exponent of the degree distribution of scale_free networks.
 
-            elif TYPE == 'regular': #regular structure with NI connections per unit
+     Input type
+     ------------------
+     N:        integer
+     TYPE:     string
+     DIRECTED: string
+     NI:       integer
+     SPARSE:   boolean
+     FORMAT:   string
+     DIR:      string or None
+     REWIRE:   double
+     EXPONENT: double
 
-                f = np.random.permutation(range(1,N))
+     Output
+     ------------------
+     J: Weighted adjacency matrix, also written to 'DIR/connectivity.npy'
+        ('DIR/connectivity.dat' if FORMAT is dat, and 'DIR/connectivity.npz'
+        if SPARSE).
 
-                a = [0]*N
-                for i in xrange(NI):
-                    a[f[i]] = 1
+     Example
+     ------------------
+     topology(20,'homogeneous','undirected',5) generates an undirected
+     connectivity matrix of 20x20, where each unit has 5 randomly-selected
+     incoming connections.
 
-                for n in xrange(N):
-                    J[n,:] = a
-                    b = a[-1]
-                    a = a[:-1]
-                    a = [b] + a
+     Author: Jose Casadiego
+     Date:   May 2017
+    '''
 
-                R = (0.5+(1-0.5)*np.random.uniform(0,1,size=(N,N)))/NI
-                J = J * R
+    rows, cols, vals = edges(N, TYPE, DIRECTED, NI, REWIRE, EXPONENT)
 
-            if DIRECTED == 'directed':
-                np.savetxt('Data/connectivity.dat', J, fmt='%.4f', delimiter='\t')
+    J = sparse.csr_matrix((vals, (rows, cols)), shape=(N,N))
+    if not SPARSE:
+        J = J.toarray()
 
-            elif DIRECTED == 'undirected':
-                for i in xrange(N):
-                    for j in xrange(N):
-                        if (J[i,j]!=0 and J[j,i] == 0):
-                            J[j,i]=J[i,j]
+    if DIR is not None:
+        save_connectivity(J, FORMAT, DIR)
 
-                np.savetxt('Data/connectivity.dat', J, fmt='%.4f', delimiter='\t')
+    return(J)
 
 if __name__ == '__main__':
     topology(10, 'regular', 'directed', 4)
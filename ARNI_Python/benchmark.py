@@ -0,0 +1,358 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+import traceback
+
+import numpy as np
+import scipy
+
+from ARNIpy import simulate, reconstruct
+from ARNIpy.basis_expansion import basis_expansion
+from ARNIpy.dataset import Dataset
+from ARNIpy.models import Kuramoto1, Kuramoto2, MichaelisMenten, Roessler
+from ARNIpy.profiling import peak, reset_peak
+from ARNIpy.topology import topology
+
+
+''' benchmark.py measures the wall time, CPU time and peak memory of
+ topology, the model equations, simulate, basis_expansion and reconstruct on
+ seeded synthetic data sets, and writes the results to a JSON file, so that
+ runs on different versions or machines can be compared.
+
+ Every measurement runs in a separate process: its inputs are generated
+ first (with the random generator seeded), and only the call itself is
+ measured. Reconstructions run on a new Dataset of the same time series
+ at every repetition, so that no repetition reuses the time derivatives
+ cached by the previous one. Peak memory is the increase of the resident
+ set size of that process over the call. Output of the functions is
+ suppressed.
+
+ Usage
+ ------------------
+ python benchmark.py [OUTPUT] [--grid quick|full] [--repeat R] [--seed SEED]
+                     [--only NAME [NAME ...]]
+
+ OUTPUT:   JSON file to which the results are written (benchmark.json by
+           default).
+ --grid:   Parameter grid of N, S, M and ORDER employed (see GRIDS).
+ --repeat: Number of times every call is timed; the best time is kept.
+ --seed:   Seed of the random generator.
+ --only:   Benchmarks to run, among topology, models, simulate,
+           basis_expansion, reconstruct, scenarios, precision and sketch.
+
+ Output
+ ------------------
+ JSON file with the versions employed and a list of results, each with the
+ benchmark name, its parameters, the best wall and CPU times in seconds,
+ the wall times of all repetitions and the peak memory in bytes, or, for
+ a benchmark that failed, the traceback of its error (error).
+ Reconstructions also report their AUC scores. The scenarios replay the
+ settings of example1.py to example4.py. The precision benchmark
+ reconstructs the scenarios with DTYPE=float32 and reports, next to the AUC
+ scores, those of float64 and the share of the first NI ranked links that
+ both precisions agree on. The sketch benchmark reconstructs long
+ recordings (see SKETCHES) with SKETCH, and reports the same comparison
+ against the exact Gram statistics, with the wall times of both
+ (wall_sketch and wall_exact).
+
+ Accompanying material to "Model-free inference of direct interactions
+ from nonlinear collective dynamics".
+'''
+
+
+MODEL = ('kuramoto1', 'kuramoto2', 'michaelis_menten', 'roessler')
+TOPOLOGY = ('homogeneous', 'regular', 'scale_free', 'small_world')
+BASIS = ('polynomial', 'polynomial_diff', 'fourier', 'fourier_diff', 'power_series', 'RBF')
+
+# Basis employed to reconstruct each model in the grids
+MODEL_BASIS = {'kuramoto1': 'fourier', 'kuramoto2': 'fourier_diff',
+               'michaelis_menten': 'polynomial', 'roessler': 'polynomial'}
+
+NI = 4
+
+GRIDS = {
+    'quick': {'N': (10, 25), 'S': (10,), 'M': (10,), 'ORDER': (2, 6)},
+    'full': {'N': (10, 25, 50, 100), 'S': (10, 30, 100), 'M': (10, 50),
+             'ORDER': (2, 6, 10)},
+}
+
+# Settings of the examples: data sets simulated and reconstructions performed
+# on them as (MODEL, NODE, BASIS, ORDER)
+SCENARIOS = {
+    'example1': (('kuramoto1', 20, NI, 10, 10),
+                 [('kuramoto1', 0, 'RBF', 10)]),
+    'example2_kuramoto2': (('kuramoto2', 25, NI, 30, 10),
+                           [('kuramoto2', 15, b, 6) for b in BASIS]),
+    'example2_michaelis_menten': (('michaelis_menten', 25, NI, 30, 10),
+                                  [('michaelis_menten', 15, b, 6) for b in BASIS]),
+    'example3': (('kuramoto2', 25, NI, 30, 10),
+                 [('kuramoto1', 15, 'RBF', k) for k in (5, 10, 15, 20, 25, 30)]),
+    'example4_S50_M5': (('roessler', 25, NI, 50, 5),
+                        [('roessler', n, 'polynomial', 6) for n in xrange(25)]),
+    'example4_S5_M50': (('roessler', 25, NI, 5, 50),
+                        [('roessler', n, 'polynomial', 6) for n in xrange(25)]),
+}
+
+# Long recordings reconstructed with sketches of the time points: data sets
+# simulated, reconstructions performed on them and sketch sizes
+SKETCHES = {
+    'kuramoto2_S1000': (('kuramoto2', 25, NI, 1000, 10),
+                        [('kuramoto2', n, 'fourier_diff', 6) for n in xrange(0, 25, 5)],
+                        (500, 1000, 2000)),
+    'michaelis_menten_S1000': (('michaelis_menten', 25, NI, 1000, 10),
+                               [('michaelis_menten', n, 'polynomial', 6) for n in xrange(0, 25, 5)],
+                               (500, 1000, 2000)),
+    'roessler_S300': (('roessler', 25, NI, 300, 10),
+                      [('roessler', n, 'polynomial', 6) for n in xrange(0, 25, 5)],
+                      (500, 1000, 2000)),
+}
+
+# Number of time series per group when streaming long recordings
+CHUNK = 50
+
+# Number of evaluations of the model equations per measurement
+CALLS = 1000
+
+def _child(conn, setup, run, repeat, seed):
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        np.random.seed(seed)
+        args = setup()
+        rss = reset_peak()
+        walls = []
+        cpus = []
+        for i in xrange(repeat):
+            cpu = sum(os.times()[:2])
+            wall = time.time()
+            out = run(*args)
+            walls.append(time.time() - wall)
+            cpus.append(sum(os.times()[:2]) - cpu)
+            if i == 0:
+                growth = peak() - rss if rss is not None else None
+        conn.send((None, (walls, cpus, growth, out if isinstance(out, dict) else None)))
+    except Exception:
+        conn.send((traceback.format_exc(), None))
+    finally:
+        conn.close()
+
+def measure(name, params, setup, run, repeat=3, seed=0):
+    '''
+     measure(name,params,setup,run,repeat,seed) calls run(*setup()) repeat
+     times in a new process, seeding the random generator with seed before
+     setup, and returns the result record of the benchmark. run may return
+     a dictionary of further quantities to be recorded, or None. If setup or
+     run fails, or the process dies, the record of the failed benchmark
+     holds the error (its traceback) instead of the measurements.
+    '''
+    parent, child = multiprocessing.Pipe(False)
+    p = multiprocessing.Process(target=_child,
+                                args=(child, setup, run, repeat, seed))
+    p.start()
+    # only the child writes, so that its death reaches the parent as EOF
+    child.close()
+    try:
+        error, result = parent.recv()
+    except EOFError:
+        error, result = None, None
+    p.join()
+    if result is None:
+        if error is None:
+            error = 'Process exited with code %s' % p.exitcode
+        print('%-16s %-60s FAILED\n%s' % (name, json.dumps(params, sort_keys=True),
+                                              error.rstrip()))
+        return({'benchmark': name, 'params': params, 'error': error})
+
+    walls, cpus, growth, out = result
+    record = {'benchmark': name, 'params': params, 'wall': min(walls),
+              'cpu': min(cpus), 'walls': walls, 'peak_bytes': growth}
+    if out:
+        record.update(out)
+    print('%-16s %-60s %9.4fs %9.1fMB' % (name, json.dumps(params, sort_keys=True),
+                                           record['wall'], (growth or 0)/2.**20))
+    return(record)
+
+def _model(MODEL, N):
+    # Model equations of a random network and a state at which to evaluate
+    # them
+    J = topology(N, 'homogeneous', 'directed', NI, DIR=None)
+    w = -2 + 4*np.random.uniform(0., 1., size=(N,))
+    if MODEL == 'kuramoto1':
+        return(Kuramoto1(J, w), np.random.uniform(-3.14, 3.14, size=(N,)))
+    elif MODEL == 'kuramoto2':
+        return(Kuramoto2(J, w), np.random.uniform(-3.14, 3.14, size=(N,)))
+    elif MODEL == 'michaelis_menten':
+        return(MichaelisMenten(J), 1 + np.random.uniform(0., 1., size=(N,)))
+    else:
+        return(Roessler(J), np.random.uniform(-5., 5., size=(3*N,)))
+
+def _evaluate(model, y):
+    for i in xrange(CALLS):
+        model(y, 0.)
+
+def _simulate(MODEL, N, NI, S, M):
+    simulate(MODEL, N, NI, S, M, DIR=None)
+
+def _expand(X, ORDER, BASIS):
+    basis_expansion(X, ORDER, BASIS, 0)
+
+def _cold(data):
+    # Dataset of the same time series as data, without its cached time
+    # derivatives and input matrices
+    return(Dataset(data.x, data.S, data.M, data.MODEL, data.connectivity,
+                   data.frequencies))
+
+def _reconstruct(data, runs):
+    data = _cold(data)
+    AUC = [reconstruct(m, n, b, k, DATA=data)[4] for m, n, b, k in runs]
+    return({'AUC': AUC})
+
+def _precision(data, runs):
+    data = _cold(data)
+    AUC = []
+    AUC64 = []
+    overlap = []
+    for m, n, b, k in runs:
+        llist, _, _, _, auc32 = reconstruct(m, n, b, k, DATA=data, DTYPE=np.float32)
+        llist64, _, _, _, auc64 = reconstruct(m, n, b, k, DATA=data)
+        AUC.append(auc32)
+        AUC64.append(auc64)
+        overlap.append(len(set(llist[:NI]) & set(llist64[:NI]))/float(NI))
+    return({'AUC': AUC, 'AUC64': AUC64, 'overlap': overlap})
+
+def _sketch(data, runs, SKETCH, seed):
+    AUC = []
+    AUC64 = []
+    overlap = []
+    wall64 = 0.
+    wall = 0.
+    for m, n, b, k in runs:
+        start = time.time()
+        llist64, _, _, _, auc64 = reconstruct(m, n, b, k, DATA=data, CHUNK=CHUNK)
+        wall64 += time.time() - start
+        start = time.time()
+        llist, _, _, _, auc = reconstruct(m, n, b, k, DATA=data, CHUNK=CHUNK,
+                                          SKETCH=SKETCH, SEED=seed)
+        wall += time.time() - start
+        AUC.append(auc)
+        AUC64.append(auc64)
+        overlap.append(len(set(llist[:NI]) & set(llist64[:NI]))/float(NI))
+    return({'AUC': AUC, 'AUC64': AUC64, 'overlap': overlap,
+            'wall_sketch': wall, 'wall_exact': wall64})
+
+def benchmarks(grid, repeat, seed, only=None):
+    '''
+     benchmarks(grid,repeat,seed,only) runs the benchmarks named in only (all
+     if None) over the parameter grid and returns the list of results.
+    '''
+    results = []
+    run = lambda name: only is None or name in only
+
+    if run('topology'):
+        for TYPE in TOPOLOGY:
+            for N in grid['N']:
+                for SPARSE in (False, True):
+                    results.append(measure(
+                        'topology', {'TYPE': TYPE, 'N': N, 'NI': NI, 'SPARSE': SPARSE},
+                        lambda: (N, TYPE, 'directed', NI, SPARSE, 'npy', None),
+                        topology, repeat, seed))
+
+    if run('models'):
+        for MODEL_ in MODEL:
+            for N in grid['N']:
+                results.append(measure(
+                    'models', {'MODEL': MODEL_, 'N': N, 'calls': CALLS},
+                    lambda: _model(MODEL_, N), _evaluate, repeat, seed))
+
+    if run('simulate'):
+        for MODEL_ in MODEL:
+            for N in grid['N']:
+                for S in grid['S']:
+                    for M in grid['M']:
+                        results.append(measure(
+                            'simulate', {'MODEL': MODEL_, 'N': N, 'S': S, 'M': M},
+                            lambda: (MODEL_, N, NI, S, M), _simulate, 1, seed))
+
+    if run('basis_expansion'):
+        for BASIS_ in BASIS:
+            for N in grid['N']:
+                for S in grid['S']:
+                    for M in grid['M']:
+                        for ORDER in grid['ORDER']:
+                            results.append(measure(
+                                'basis_expansion', {'BASIS': BASIS_, 'N': N,
+                                'S': S, 'M': M, 'ORDER': ORDER},
+                                lambda: (np.random.uniform(-3., 3., size=(N, S*(M-1))),
+                                         ORDER, BASIS_),
+                                _expand, repeat, seed))
+
+    if run('reconstruct'):
+        for MODEL_ in MODEL:
+            for N in grid['N']:
+                for S in grid['S']:
+                    for M in grid['M']:
+                        for ORDER in grid['ORDER']:
+                            results.append(measure(
+                                'reconstruct', {'MODEL': MODEL_, 'BASIS': MODEL_BASIS[MODEL_],
+                                'N': N, 'S': S, 'M': M, 'ORDER': ORDER},
+                                lambda: (simulate(MODEL_, N, NI, S, M, DIR=None),
+                                         [(MODEL_, 0, MODEL_BASIS[MODEL_], ORDER)]),
+                                _reconstruct, repeat, seed))
+
+    if run('scenarios'):
+        for name in sorted(SCENARIOS):
+            data, runs = SCENARIOS[name]
+            MODEL_, N, NI_, S, M = data
+            results.append(measure(
+                'scenarios', {'scenario': name, 'stage': 'simulate'},
+                lambda: data, _simulate, 1, seed))
+            results.append(measure(
+                'scenarios', {'scenario': name, 'stage': 'reconstruct'},
+                lambda: (simulate(MODEL_, N, NI_, S, M, DIR=None), runs),
+                _reconstruct, repeat, seed))
+
+    if run('precision'):
+        for name in sorted(SCENARIOS):
+            data, runs = SCENARIOS[name]
+            MODEL_, N, NI_, S, M = data
+            results.append(measure(
+                'precision', {'scenario': name, 'DTYPE': 'float32'},
+                lambda: (simulate(MODEL_, N, NI_, S, M, DIR=None), runs),
+                _precision, 1, seed))
+
+    if run('sketch'):
+        for name in sorted(SKETCHES):
+            data, runs, sizes = SKETCHES[name]
+            MODEL_, N, NI_, S, M = data
+            for SKETCH in sizes:
+                results.append(measure(
+                    'sketch', {'scenario': name, 'SKETCH': SKETCH},
+                    lambda: (simulate(MODEL_, N, NI_, S, M, DIR=None), runs, SKETCH, seed),
+                    _sketch, 1, seed))
+
+    return(results)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks of ARNIpy.')
+    parser.add_argument('output', nargs='?', default='benchmark.json')
+    parser.add_argument('--grid', choices=sorted(GRIDS), default='quick')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', nargs='+', default=None)
+    args = parser.parse_args()
+
+    results = benchmarks(GRIDS[args.grid], args.repeat, args.seed, args.only)
+
+    report = {'grid': args.grid, 'seed': args.seed, 'repeat': args.repeat,
+              'python': platform.python_version(), 'numpy': np.__version__,
+              'scipy': scipy.__version__, 'machine': platform.machine(),
+              'processor': platform.processor(), 'time': time.time(),
+              'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+    print('Results written to %s' % args.output)
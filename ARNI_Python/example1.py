@@ -60,11 +60,11 @@ S=10
 M=10
 ORDER=10
 
-simulate(MODEL[0], N, NI, S, M)
+data = simulate(MODEL[0], N, NI, S, M)
 
 NODE=0
 
-llist, cost, FPR, TPR, AUC = reconstruct(MODEL[0], NODE, BASIS[5], ORDER)
+llist, cost, FPR, TPR, AUC = reconstruct(MODEL[0], NODE, BASIS[5], ORDER, DATA=data)
 
 f, (ax1,ax2) = plt.subplots(2,1)
 st = f.suptitle('Reconstruction for unit ' + str(NODE))
@@ -64,14 +64,14 @@ M=10
 NODE=15
 ORDER=6
 
-simulate(MODEL[1],N,NI,S,M)
+data = simulate(MODEL[1],N,NI,S,M)
 
 #This may take several minutes
 f, axes = plt.subplots(2,3)
 axes = axes.ravel()
 st = f.suptitle('Reconstruction with different basis for ' + MODEL[1])
 for i in range(len(BASIS)):
-    llist, cost, FPR, TPR, AUC = reconstruct(MODEL[1], NODE, BASIS[i], ORDER)
+    llist, cost, FPR, TPR, AUC = reconstruct(MODEL[1], NODE, BASIS[i], ORDER, DATA=data)
     axes[i].plot(range(1,len(cost)+1), cost)
     axes[i].scatter(range(1,len(cost)+1), cost)
     axes[i].set_title('Fitting Costs: ' + NAMES[i] + '\nAUC=%.3f' % AUC,
@@ -85,13 +85,13 @@ f.subplots_adjust(top=0.80)
 
 #f.savefig('./Graphs/example2_kuramoto2.pdf')
 
-simulate(MODEL[2],N,NI,S,M)
+data = simulate(MODEL[2],N,NI,S,M)
 
 f, axes = plt.subplots(2,3)
 axes = axes.ravel()
 st = f.suptitle('Reconstruction with different basis for ' + MODEL[2])
 for i in range(len(BASIS)):
-    llist, cost, FPR, TPR, AUC = reconstruct(MODEL[2], NODE, BASIS[i], ORDER)
+    llist, cost, FPR, TPR, AUC = reconstruct(MODEL[2], NODE, BASIS[i], ORDER, DATA=data)
     axes[i].plot(range(1,len(cost)+1), cost)
     axes[i].scatter(range(1,len(cost)+1), cost)
     axes[i].set_title('Fitting Costs: ' + NAMES[i] + '\nAUC=%.3f' % AUC,
@@ -56,7 +56,7 @@ S=30
 M=10
 NODE=15
 
-simulate(MODEL[1],N,NI,S,M)
+data = simulate(MODEL[1],N,NI,S,M)
 ORDER=(5,10,15,20,25,30)
 f, axes = plt.subplots(2,3)
 st = f.suptitle('Reconstruction with different number of RBF')
@@ -64,7 +64,7 @@ st = f.suptitle('Reconstruction with different number of RBF')
 axes = axes.ravel()
 #this may take several minutes
 for t,k in enumerate(ORDER):
-    llist, cost, FPR, TPR, AUC = reconstruct(MODEL[0], NODE, BASIS[5], k)
+    llist, cost, FPR, TPR, AUC = reconstruct(MODEL[0], NODE, BASIS[5], k, DATA=data)
     axes[t].plot(range(1,len(cost)+1), cost)
     axes[t].scatter(range(1,len(cost)+1), cost)
     axes[t].set_title('Fitting costs: ' + str(k) + ' RBF\nAUC=%.3f' % AUC, fontsize=8)
@@ -64,14 +64,14 @@ x = range(N)
 np.random.shuffle(x)
 NODE = x[:4]
 
-simulate(MODEL[3],N,NI,S,M)
+data = simulate(MODEL[3],N,NI,S,M)
 
 f1,axes1 = plt.subplots(2,2)
 st1 = f1.suptitle('Reconstruction of oscillators using short time series')
 axes1 = np.ravel(axes1)
 #this may take several minutes
 for t,node in enumerate(NODE):
-    llist,cost, FPR, TPR, AUC = reconstruct(MODEL[3], node, BASIS[0], ORDER)
+    llist,cost, FPR, TPR, AUC = reconstruct(MODEL[3], node, BASIS[0], ORDER, DATA=data)
     axes1[t].plot(FPR,TPR)
     axes1[t].set_title('ROC-curve unit: ' + str(node), fontsize=8)
     axes1[t].set_xlabel('FPR')
@@ -85,14 +85,14 @@ f1.subplots_adjust(top=0.80)
 
 S=5
 M=50
-simulate(MODEL[3],N,NI,S,M)
+data = simulate(MODEL[3],N,NI,S,M)
 
 f2,axes2 = plt.subplots(2,2)
 st2 = f2.suptitle('Reconstruction of oscillators using long time series')
 axes2 = np.ravel(axes2)
 #this may take several minutes
 for t, node in enumerate(NODE):
-    llist,cost,FPR,TPR,AUC = reconstruct(MODEL[3], node, BASIS[0], ORDER)
+    llist,cost,FPR,TPR,AUC = reconstruct(MODEL[3], node, BASIS[0], ORDER, DATA=data)
     axes2[t].plot(FPR,TPR)
     axes2[t].set_title('ROC-curve unit: ' + str(node), fontsize=8)
     axes2[t].set_xlabel('FPR')